@@ -13,7 +13,7 @@ DeepSeek API 配置和工具类
 
 import os
 from pathlib import Path
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -43,6 +43,37 @@ def get_client() -> OpenAI:
     )
 
 
+def get_async_client(max_connections: int = 20) -> AsyncOpenAI:
+    """
+    获取异步DeepSeek客户端
+    
+    客户端内部维护HTTP连接池，应在整个进程内共享一个实例，
+    而不是每次调用（或每个Agent）各自创建。
+    
+    Args:
+        max_connections: 连接池最大连接数
+        
+    Returns:
+        AsyncOpenAI: 配置好的异步客户端实例
+    """
+    import httpx
+    
+    if not DEEPSEEK_API_KEY:
+        raise ValueError("请设置 DEEPSEEK_API_KEY 环境变量")
+    
+    return AsyncOpenAI(
+        api_key=DEEPSEEK_API_KEY,
+        base_url=DEEPSEEK_BASE_URL,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+    )
+
+
 def chat_completion(
     message: str,
     model: str = "deepseek-chat",
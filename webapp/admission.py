@@ -0,0 +1,164 @@
+"""
+🚦 准入控制与过载保护
+======================
+
+上课时全班同时打开同一页面，uvicorn 会把请求一直排队直到超时。
+这里在重接口前加一层快速拒绝：
+- 每客户端令牌桶：超出速率返回 429 + Retry-After（FastAPI 依赖）
+- 全局并发上限：在途请求过多时返回 503 + Retry-After（ASGI 中间件，从收到请求一直计数到
+  响应体发送完毕，流式响应也不会提前释放名额）
+
+客户端按IP区分。位于反向代理之后时设置 trusted_proxy_hops（代理层数），取 X-Forwarded-For
+中由可信代理追加的那一跳；客户端自己填写的前几跳不可信，不会被使用。
+注意：同一校园网/教室NAT之后的所有学员共享一个出口IP，也就共享一个令牌桶。
+课堂部署时按人数调高 ADMISSION_RATE / ADMISSION_BURST（例如 40 人的班级设为 rate=50、burst=200）；
+不使用 Cookie 区分客户端，因为它与 X-Forwarded-For 的第一跳一样可以被随意伪造。
+
+使用方式：
+    admission = AdmissionController(rate=5, burst=20, max_in_flight=64)
+    app.add_middleware(AdmissionMiddleware, controller=admission, paths=("/api/heavy", "/api/files/"))
+
+    @app.get("/api/heavy", dependencies=[Depends(admission)])
+    async def heavy(): ...
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+
+class TokenBucket:
+    """令牌桶：rate 个/秒，容量 burst"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """尝试取一个令牌；成功返回0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """FastAPI 依赖：按客户端限速 + 全局在途请求上限"""
+
+    def __init__(self, rate: float, burst: float, max_in_flight: int,
+                 max_clients: int = 10000, overload_retry_after: int = 1,
+                 trusted_proxy_hops: int = 0):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_clients = max_clients
+        self.overload_retry_after = overload_retry_after
+        self.trusted_proxy_hops = trusted_proxy_hops
+        self.buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.in_flight = 0
+        self.counts = {"admitted": 0, "rate_limited": 0, "overloaded": 0}
+
+    def client_key(self, request: Request) -> str:
+        """
+        经过 N 层可信代理时，X-Forwarded-For 的倒数第 N 跳是最外层代理看到的客户端地址；
+        更靠前的内容由客户端控制，随意伪造即可每次换一个令牌桶
+        """
+        if self.trusted_proxy_hops:
+            hops = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+            if len(hops) >= self.trusted_proxy_hops:
+                return hops[-self.trusted_proxy_hops]
+        return request.client.host if request.client else "unknown"
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    async def __call__(self, request: Request):
+        """按客户端限速；全局上限由 AdmissionMiddleware 在进入路由前检查，过载时不消耗客户端令牌"""
+        wait = self._bucket(self.client_key(request)).take()
+        if wait:
+            self.counts["rate_limited"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="请求过于频繁，请稍后重试",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+        self.counts["admitted"] += 1
+
+    def metrics(self) -> str:
+        """Prometheus 文本格式指标"""
+        lines = [
+            "# HELP admission_requests_total 准入决策计数",
+            "# TYPE admission_requests_total counter",
+        ]
+        lines += [
+            f'admission_requests_total{{result="{result}"}} {count}'
+            for result, count in self.counts.items()
+        ]
+        gauges = {
+            "admission_in_flight": self.in_flight,
+            "admission_max_in_flight": self.max_in_flight,
+            "admission_rate_per_client": self.rate,
+            "admission_burst_per_client": self.burst,
+            "admission_tracked_clients": len(self.buckets),
+        }
+        for name, value in gauges.items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class AdmissionMiddleware:
+    """
+    全局在途上限：覆盖从收到请求到响应发送完毕的整个过程
+
+    paths 中以 / 结尾的项按前缀匹配，其余按完整路径匹配；SSE 等长连接不要放进来，
+    否则会一直占着名额。
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: tuple[str, ...]):
+        self.app = app
+        self.controller = controller
+        self.exact = {p for p in paths if not p.endswith("/")}
+        self.prefixes = tuple(p for p in paths if p.endswith("/"))
+
+    def _matches(self, path: str) -> bool:
+        return path in self.exact or path.startswith(self.prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._matches(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        controller = self.controller
+        if controller.in_flight >= controller.max_in_flight:
+            controller.counts["overloaded"] += 1
+            response = JSONResponse(
+                {"detail": "服务繁忙，请稍后重试"}, status_code=503,
+                headers={"Retry-After": str(controller.overload_retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        controller.in_flight += 1
+        try:
+            # 先让出一次事件循环：很多接口本身不 await，不让出的话每个请求都在下一个请求
+            # 登记之前就已完成，在途数始终接近0；让出后同时就绪的请求都会先登记
+            await asyncio.sleep(0)
+            await self.app(scope, receive, send)
+        finally:
+            controller.in_flight -= 1
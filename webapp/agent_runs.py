@@ -0,0 +1,247 @@
+"""
+📡 Agent运行登记与事件推送
+===========================
+
+网页发起的 Agent 运行在后台任务中执行，事件（阶段、逐段输出、评估）写入该运行的环形缓冲：
+- 每个事件带递增序号，SSE 以 id: 字段发送，断线重连时按 Last-Event-ID 从缓冲补发
+- 每个订阅者一个有界队列；队列满说明客户端跟不上，直接断开它（发送 dropped 事件），
+  浏览器的 EventSource 会自动重连并从缓冲补齐，不会拖慢运行本身或其他订阅者
+- 同时运行的数量有上限，已结束的运行只保留最近若干个
+- 每次运行都会调用付费模型，启动运行的接口默认关闭（见 require_runs_token），
+  所有网页运行共享一个进程级 token 预算（AGENT_WEB_TOKEN_BUDGET）
+
+启用方式（两个环境变量都需要设置）：
+    ENABLE_AGENT_RUNS=1
+    AGENT_RUNS_TOKEN=<随机长字符串>
+
+启动运行时携带 Authorization: Bearer <token>。
+
+使用方式：
+    registry = RunRegistry()
+    run = registry.start("设计一个RAG问答接口", "engineer")
+    async for sse_text in registry.stream(run, last_event_id=None):
+        ...
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import Header, HTTPException
+
+
+RUN_BUFFER_SIZE = 2000
+SUBSCRIBER_QUEUE_SIZE = 256
+MAX_ACTIVE_RUNS = 4
+MAX_RETAINED_RUNS = 50
+SSE_HEARTBEAT_SECONDS = 15
+
+# 订阅者被断开时放入队列的标记
+_DROPPED = object()
+_FINISHED = object()
+
+
+class TooManyRunsError(RuntimeError):
+    """同时运行的数量已达上限"""
+
+
+@dataclass
+class AgentRun:
+    """一次Agent运行：事件环形缓冲 + 订阅者队列"""
+    run_id: str
+    task: str
+    role: str
+    status: str = "running"
+    created_at: float = field(default_factory=time.time)
+    first_event_ms: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    events: deque = field(default_factory=lambda: deque(maxlen=RUN_BUFFER_SIZE))
+    next_id: int = 1
+    subscribers: set = field(default_factory=set)
+    dropped_subscribers: int = 0
+    _started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    def emit(self, event: dict):
+        if self.first_event_ms is None and event.get("type") == "token":
+            self.first_event_ms = round((time.perf_counter() - self._started) * 1000, 1)
+        item = (self.next_id, event)
+        self.next_id += 1
+        self.events.append(item)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self._drop(queue)
+
+    def _drop(self, queue: asyncio.Queue):
+        """慢消费者：清空积压并让其连接结束"""
+        self.subscribers.discard(queue)
+        self.dropped_subscribers += 1
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(_DROPPED)
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self.emit({"type": "end", "status": status, "error": error})
+        for queue in list(self.subscribers):
+            # 队列满也要保证结束标记能送达
+            if queue.full():
+                self._drop(queue)
+            else:
+                queue.put_nowait(_FINISHED)
+        self.subscribers.clear()
+
+    def subscribe(self, last_event_id: Optional[int]) -> tuple[list, Optional[asyncio.Queue]]:
+        """返回 (需补发的事件, 实时队列)；运行已结束时队列为 None"""
+        after = last_event_id or 0
+        backlog = [item for item in self.events if item[0] > after]
+        if self.done:
+            return backlog, None
+        queue: asyncio.Queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return backlog, queue
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "task": self.task,
+            "role": self.role,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "first_event_ms": self.first_event_ms,
+            "events": self.next_id - 1,
+            "buffered_from": self.events[0][0] if self.events else None,
+            "subscribers": len(self.subscribers),
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+def require_runs_token(authorization: Optional[str] = Header(default=None)):
+    """未启用时返回404，隐藏端点的存在"""
+    token = os.getenv("AGENT_RUNS_TOKEN", "")
+    if not os.getenv("ENABLE_AGENT_RUNS") or not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not authorization or not hmac.compare_digest(authorization, f"Bearer {token}"):
+        raise HTTPException(status_code=403, detail="需要运行令牌")
+
+
+def _default_orchestrator():
+    # 延迟导入：不使用Agent运行时不影响网页冷启动
+    from webapp.agents import EnhancedOrchestrator
+    from webapp.history import DEFAULT_HISTORY_DIR
+    from webapp.token_budget import TokenBudget
+    # 协调器在进程内共享，预算即网页运行的累计花费上限；用完后新运行以 BudgetExceededError 失败
+    # 长期运行的网页进程中历史只在内存保留最近若干条，更早的写入 AGENT_HISTORY_DIR
+    return EnhancedOrchestrator(
+        budget=TokenBudget(run_limit=int(os.getenv("AGENT_WEB_TOKEN_BUDGET", "200000"))),
+        history_dir=DEFAULT_HISTORY_DIR,
+    )
+
+
+def sse_event(event_id: int, event: dict) -> str:
+    return (f"id: {event_id}\nevent: {event.get('type', 'message')}\n"
+            f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n")
+
+
+class RunRegistry:
+    """运行登记表：启动、查询、订阅"""
+
+    def __init__(self, orchestrator_factory: Callable = _default_orchestrator,
+                 max_active: int = MAX_ACTIVE_RUNS, max_retained: int = MAX_RETAINED_RUNS):
+        self.orchestrator_factory = orchestrator_factory
+        self.max_active = max_active
+        self.max_retained = max_retained
+        self.runs: OrderedDict[str, AgentRun] = OrderedDict()
+        self._orchestrator = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def orchestrator(self):
+        if self._orchestrator is None:
+            self._orchestrator = self.orchestrator_factory()
+        return self._orchestrator
+
+    @property
+    def active(self) -> int:
+        return sum(1 for run in self.runs.values() if not run.done)
+
+    def get(self, run_id: str) -> Optional[AgentRun]:
+        return self.runs.get(run_id)
+
+    def start(self, task: str, role: str) -> AgentRun:
+        """在后台任务中执行 stream_with_reflection；超过并发上限时抛 TooManyRunsError"""
+        from webapp.agents import AgentRole
+        agent_role = AgentRole(role)
+        if self.active >= self.max_active:
+            raise TooManyRunsError(f"同时运行的Agent任务已达上限 {self.max_active}")
+        run = AgentRun(run_id=uuid.uuid4().hex[:12], task=task, role=agent_role.value)
+        self.runs[run.run_id] = run
+        self._evict()
+        events = self.orchestrator.stream_with_reflection(task, agent_role)
+        worker = asyncio.create_task(self._drive(run, events))
+        self._tasks.add(worker)
+        worker.add_done_callback(self._tasks.discard)
+        return run
+
+    async def _drive(self, run: AgentRun, events: AsyncIterator[dict]):
+        try:
+            async for event in events:
+                run.emit(event)
+        except asyncio.CancelledError:
+            run.finish("cancelled")
+            raise
+        except Exception as e:
+            run.finish("failed", f"{type(e).__name__}: {e}")
+        else:
+            run.finish("completed")
+
+    def _evict(self):
+        """只保留最近的已结束运行"""
+        finished = [rid for rid, run in self.runs.items() if run.done]
+        for run_id in finished[:max(0, len(self.runs) - self.max_retained)]:
+            del self.runs[run_id]
+
+    async def stream(self, run: AgentRun, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """SSE 文本流：先补发缓冲中的事件，再推送实时事件"""
+        backlog, queue = run.subscribe(last_event_id)
+        try:
+            for event_id, event in backlog:
+                yield sse_event(event_id, event)
+            if queue is None:
+                return
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if item is _FINISHED:
+                    return
+                if item is _DROPPED:
+                    yield f"event: dropped\ndata: {json.dumps({'reason': 'slow_consumer'})}\n\n"
+                    return
+                yield sse_event(*item)
+        finally:
+            if queue is not None:
+                run.subscribers.discard(queue)
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -17,14 +17,31 @@ Agent团队（全新优化提示词）：
 - 🎨 Designer (设计师·Aria) - UI/UX设计
 - 🔧 Engineer (工程师·Atlas) - 代码实现
 - ✅ Reviewer (审核员·Vera) - 质量检查
+
+运行方式（在项目根目录）：
+    python -m webapp.agents
 """
 
 from dataclasses import dataclass, field
-from typing import Callable, Optional, Any, Literal
+from typing import AsyncIterator, Callable, Optional, Any, Literal
 from enum import Enum
 from datetime import datetime
+from pathlib import Path
 import json
 import asyncio
+import struct
+import os
+import time
+
+from webapp.cassette import CassetteMissError
+from webapp.checkpoint import CheckpointStore, new_run_id
+from webapp.history import DEFAULT_HISTORY_DIR, DEFAULT_HISTORY_SIZE, SpillingHistory
+from webapp.llm_pool import LLMClientPool, get_default_pool
+from webapp.message_bus import DEFAULT_MAILBOX_SIZE, MessageBus
+from webapp.model_router import REASONER_MODEL, ModelRouter
+from webapp.reflection_policy import ReflectionPolicy, score_ratio
+from webapp.research_cache import ResearchCache
+from webapp.token_budget import BudgetExceededError, TokenBudget, count_text_tokens, count_tokens
 
 
 # ============================================================
@@ -317,37 +334,127 @@ async def my_function(param: str) -> MyModel:
 
 
 # ============================================================
-# Agent基类
+# Agent消息与状态
 # ============================================================
 
-@dataclass
+MessageType = Literal["request", "response", "feedback", "reflection"]
+
+# 单调时钟与墙钟的差值：消息内部用 monotonic_ns，需要日期时再换算
+_MONOTONIC_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+@dataclass(slots=True)
 class AgentMessage:
-    """Agent间通信消息"""
+    """Agent间通信消息（timestamp 为 time.monotonic_ns()，构造时不做字符串格式化）"""
     from_agent: AgentRole
     to_agent: AgentRole
-    content: str
-    message_type: Literal["request", "response", "feedback", "reflection"]
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    content: Any
+    message_type: MessageType
+    timestamp: int = field(default_factory=time.monotonic_ns)
+    correlation_id: Optional[str] = None
+    
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp((self.timestamp + _MONOTONIC_OFFSET_NS) / 1e9)
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentState:
     """Agent状态"""
     current_task: Optional[str] = None
-    messages: list = field(default_factory=list)
+    messages: SpillingHistory = field(default_factory=SpillingHistory)
     context: dict = field(default_factory=dict)
     iteration: int = 0
+    
+    def snapshot(self) -> dict:
+        """可写入检查点的部分（消息历史另有落盘机制，不在此保存）"""
+        return {"current_task": self.current_task, "context": self.context, "iteration": self.iteration}
+    
+    def restore(self, data: dict):
+        self.current_task = data.get("current_task")
+        self.context = data.get("context") or {}
+        self.iteration = max(self.iteration, data.get("iteration", 0))
+
 
+# ============================================================
+# 消息编解码
+# ============================================================
+# 角色与消息类型编码为下标，解码时直接取回同一个枚举成员/字符串对象。
+# 时间戳编码为墙钟纳秒，跨进程解码后仍然可比较。
+
+_ROLES: tuple[AgentRole, ...] = tuple(AgentRole)
+_ROLE_CODES = {role: i for i, role in enumerate(_ROLES)}
+_MESSAGE_TYPES: tuple[str, ...] = ("request", "response", "feedback", "reflection")
+_MESSAGE_TYPE_CODES = {t: i for i, t in enumerate(_MESSAGE_TYPES)}
+
+# from, to, type, content格式(0=文本 1=JSON), 墙钟ns, correlation_id长度
+_MESSAGE_HEADER = struct.Struct("<BBBBqH")
+# 复用同一个编码器，避免 json.dumps 带参数时每次新建 JSONEncoder
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def encode_message(message: AgentMessage) -> bytes:
+    """紧凑二进制格式：定长头 + correlation_id + 内容"""
+    if isinstance(message.content, str):
+        kind, body = 0, message.content.encode("utf-8")
+    else:
+        kind = 1
+        body = _JSON_ENCODER.encode(message.content).encode("utf-8")
+    correlation = message.correlation_id.encode("ascii") if message.correlation_id else b""
+    return _MESSAGE_HEADER.pack(
+        _ROLE_CODES[message.from_agent], _ROLE_CODES[message.to_agent],
+        _MESSAGE_TYPE_CODES[message.message_type], kind,
+        message.timestamp + _MONOTONIC_OFFSET_NS, len(correlation)
+    ) + correlation + body
+
+
+def decode_message(data: bytes) -> AgentMessage:
+    src, dst, mtype, kind, wall_ns, corr_len = _MESSAGE_HEADER.unpack_from(data)
+    offset = _MESSAGE_HEADER.size
+    correlation = data[offset:offset + corr_len].decode("ascii") if corr_len else None
+    body = data[offset + corr_len:].decode("utf-8")
+    return AgentMessage(
+        _ROLES[src], _ROLES[dst], body if kind == 0 else json.loads(body),
+        _MESSAGE_TYPES[mtype], wall_ns - _MONOTONIC_OFFSET_NS, correlation
+    )
+
+
+def message_to_json(message: AgentMessage) -> str:
+    """紧凑JSON数组：[from, to, type, 墙钟ns, content, correlation_id]"""
+    return _JSON_ENCODER.encode([
+        _ROLE_CODES[message.from_agent], _ROLE_CODES[message.to_agent],
+        _MESSAGE_TYPE_CODES[message.message_type],
+        message.timestamp + _MONOTONIC_OFFSET_NS, message.content, message.correlation_id
+    ])
+
+
+def message_from_json(text: str) -> AgentMessage:
+    src, dst, mtype, wall_ns, content, correlation = json.loads(text)
+    return AgentMessage(
+        _ROLES[src], _ROLES[dst], content, _MESSAGE_TYPES[mtype],
+        wall_ns - _MONOTONIC_OFFSET_NS, correlation
+    )
+
+
+# ============================================================
+# Agent基类
+# ============================================================
 
 class BaseAgent:
     """增强版Agent基类"""
     
-    def __init__(self, role: AgentRole, name: str):
+    def __init__(self, role: AgentRole, name: str, llm: Optional[LLMClientPool] = None):
         self.role = role
         self.name = name
         self.prompt = AGENT_PROMPTS.get(role, "")
         self.state = AgentState()
-        self.history: list[dict] = []
+        # 只在内存中保留最近的记录；由协调器替换为可落盘的历史
+        self.history = SpillingHistory()
+        # 所有Agent共享同一个客户端池；没有API Key时退回模拟输出
+        self.llm = llm if llm is not None else get_default_pool()
+        # 由协调器注入本次运行的token预算与模型路由
+        self.budget: Optional[TokenBudget] = None
+        self.router: Optional[ModelRouter] = None
     
     def get_identity(self) -> str:
         role_icons = {
@@ -363,9 +470,57 @@ class BaseAgent:
         icon = role_icons.get(self.role, "🤖")
         return f"{icon} {self.name} ({self.role.value})"
     
+    async def _complete(self, messages: list[dict], route_reason: Optional[str] = None,
+                        **overrides) -> dict:
+        """
+        通过共享客户端池调用模型，返回输出与用量信息
+        
+        配置了路由且未显式指定 model 时，由路由按角色与提示词长度选择模型
+        """
+        if self.router is not None and "model" not in overrides:
+            overrides["model"], route_reason = self.router.choose(self.role.value, count_tokens(messages))
+        result = await self.llm.complete(
+            self.role.value, messages, agent=self.name, budget=self.budget, **overrides
+        )
+        if self.router is not None:
+            self.router.record_call(overrides["model"], route_reason or "指定模型", result)
+        return {
+            "output": result.content,
+            "model": result.model,
+            "route_reason": route_reason,
+            "latency_s": round(result.latency_s, 3),
+            "prompt_tokens": result.prompt_tokens,
+            "completion_tokens": result.completion_tokens
+        }
+    
+    def build_messages(self, task: str, context: Any = None) -> list[dict]:
+        """
+        按“稳定前缀 → 可变部分”的顺序组织消息，以便命中服务端前缀缓存
+        
+        1. 系统提示词（AGENT_PROMPTS 中的常量，逐字节不变）
+        2. 共享上下文（字典按键排序序列化，相同上下文得到相同字节）
+        3. 本次任务（每次都不同，放在最后）
+        """
+        parts = []
+        if context:
+            if not isinstance(context, str):
+                context = json.dumps(context, ensure_ascii=False, sort_keys=True)
+            parts.append(f"## 背景资料\n{context}")
+        parts.append(f"## 当前任务\n{task}")
+        return [
+            {"role": "system", "content": self.prompt},
+            {"role": "user", "content": "\n\n".join(parts)}
+        ]
+    
     async def think(self, context: str) -> str:
         """思考过程 - 结合系统提示"""
-        thought = f"""
+        if self.llm.available:
+            response = await self._complete(self.build_messages(
+                f"请先分析下面的任务，列出思考要点，暂不给出最终交付物：\n\n{context}"
+            ))
+            thought = response["output"]
+        else:
+            thought = f"""
 [{self.name} 正在思考]
 系统提示: {self.prompt[:200]}...
 输入上下文: {context[:300]}...
@@ -373,21 +528,97 @@ class BaseAgent:
         self.history.append({"type": "thought", "content": thought})
         return thought
     
-    async def act(self, task: str) -> dict:
-        """执行任务"""
+    async def act(self, task: str, context: Any = None, model: Optional[str] = None,
+                  route_reason: Optional[str] = None) -> dict:
+        """执行任务（context 为可选的共享背景资料，如研究结果；model 跳过路由直接指定模型）"""
         self.state.current_task = task
         self.state.iteration += 1
         
-        # 模拟执行
         result = {
             "agent": self.name,
             "task": task,
-            "status": "completed",
-            "output": f"[{self.name}] 已完成任务: {task}"
+            "status": "completed"
         }
+        if self.llm.available:
+            overrides = {"model": model} if model else {}
+            result.update(await self._complete(self.build_messages(task, context),
+                                               route_reason=route_reason, **overrides))
+        else:
+            # 模拟执行
+            result["output"] = f"[{self.name}] 已完成任务: {task}"
         
         self.history.append({"type": "action", "task": task, "result": result})
         return result
+    
+    async def act_stream(self, task: str, context: Any = None) -> AsyncIterator[dict]:
+        """
+        与 act 相同，但以事件流的形式产出：
+        {"type": "start"} → 若干 {"type": "token", "text": ...} → {"type": "result", "result": ...}
+        
+        配置了路由时同样由路由选择模型，流结束后计入路由统计
+        """
+        self.state.current_task = task
+        self.state.iteration += 1
+        yield {"type": "start", "agent": self.name, "role": self.role.value, "task": task}
+        
+        result = {"agent": self.name, "task": task, "status": "completed"}
+        if self.llm.available:
+            messages = self.build_messages(task, context)
+            overrides, route_reason = {}, None
+            if self.router is not None:
+                overrides["model"], route_reason = self.router.choose(self.role.value, count_tokens(messages))
+            finished = []
+            parts = []
+            async for text in self.llm.stream(
+                self.role.value, messages, agent=self.name, budget=self.budget,
+                on_result=finished.append, **overrides
+            ):
+                parts.append(text)
+                yield {"type": "token", "agent": self.name, "text": text}
+            output = "".join(parts)
+            if finished:
+                if self.router is not None:
+                    self.router.record_call(overrides["model"], route_reason, finished[0])
+                result.update(model=finished[0].model, route_reason=route_reason,
+                              latency_s=round(finished[0].latency_s, 3),
+                              prompt_tokens=finished[0].prompt_tokens,
+                              completion_tokens=finished[0].completion_tokens)
+        else:
+            # 模拟执行
+            output = f"[{self.name}] 已完成任务: {task}"
+            yield {"type": "token", "agent": self.name, "text": output}
+        
+        result["output"] = output
+        self.history.append({"type": "action", "task": task, "result": result})
+        yield {"type": "result", "agent": self.name, "result": result}
+    
+    async def serve(self, bus: MessageBus):
+        """
+        作为长期运行的消费者处理自己邮箱中的请求，取消任务即停止
+        
+        请求内容为任务字符串，或 {"task": ..., "context": ...}
+        """
+        while True:
+            message = await bus.receive(self.role)
+            self.state.messages.append({
+                "from": message.from_agent.value,
+                "type": message.message_type,
+                "correlation_id": message.correlation_id,
+                "timestamp": message.timestamp
+            })
+            if message.message_type != "request":
+                continue
+            content = message.content
+            if isinstance(content, dict):
+                task, context = content["task"], content.get("context")
+            else:
+                task, context = str(content), None
+            try:
+                result = await self.act(task, context)
+            except Exception as e:
+                await bus.respond(message, error=e)
+            else:
+                await bus.respond(message, result)
 
 
 # ============================================================
@@ -397,8 +628,9 @@ class BaseAgent:
 class ResearcherAgent(BaseAgent):
     """🔬 研究员Agent - 检索最新知识"""
     
-    def __init__(self):
-        super().__init__(AgentRole.RESEARCHER, "研究员·Neo")
+    def __init__(self, cache: Optional[ResearchCache] = None, llm: Optional[LLMClientPool] = None):
+        super().__init__(AgentRole.RESEARCHER, "研究员·Neo", llm)
+        self.cache = cache
         self.knowledge_sources = [
             "FastAPI官方文档",
             "LangChain/LangGraph文档",
@@ -407,12 +639,20 @@ class ResearcherAgent(BaseAgent):
             "技术博客和教程"
         ]
     
-    async def research(self, topic: str) -> dict:
-        """执行研究任务"""
+    async def research(self, topic: str, force_refresh: bool = False) -> dict:
+        """执行研究任务（相同主题与来源命中缓存时直接返回）"""
+        sources = self.knowledge_sources[:3]
+        if self.cache is not None and not force_refresh:
+            # SQLite 读写放到线程中，避免阻塞事件循环上并发运行的其他任务
+            cached = await asyncio.to_thread(self.cache.get, topic, sources)
+            if cached is not None:
+                print(f"🔬 [{self.name}] 命中研究缓存: {topic}")
+                return cached
+        
         # 在实际应用中，这里会调用搜索API或爬虫
         research_result = {
             "topic": topic,
-            "sources": self.knowledge_sources[:3],
+            "sources": sources,
             "key_findings": [
                 f"关于{topic}的最新发现1",
                 f"关于{topic}的最新发现2",
@@ -426,18 +666,32 @@ class ResearcherAgent(BaseAgent):
         print(f"🔬 [{self.name}] 研究主题: {topic}")
         print(f"   📚 参考来源: {', '.join(research_result['sources'])}")
         
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, topic, sources, research_result)
         return research_result
 
 
 class ReflectorAgent(BaseAgent):
     """🪞 反思者Agent - 评估与优化"""
     
-    def __init__(self):
-        super().__init__(AgentRole.REFLECTOR, "反思者·Mirror")
+    SCORE_DIMENSIONS = ("completeness", "accuracy", "actionability", "clarity", "best_practices")
+    # 单次批量请求中待评估内容的token上限（不含系统提示词）
+    BATCH_PROMPT_TOKENS = 6000
+    # 批量请求中每条评估预留的输出token
+    OUTPUT_TOKENS_PER_ITEM = 300
+    # 轻量反思只看输出开头这么多字符，只要分数
+    LIGHT_CONTENT_CHARS = 1500
+    LIGHT_MAX_TOKENS = 300
     
-    async def reflect(self, content: str, content_type: str = "general") -> dict:
-        """反思评估"""
-        # 评估维度
+    def __init__(self, llm: Optional[LLMClientPool] = None):
+        super().__init__(AgentRole.REFLECTOR, "反思者·Mirror", llm)
+        self.batch_stats = {
+            "items": 0, "requests": 0, "single_fallbacks": 0,
+            "calls_saved": 0, "prompt_tokens_saved": 0, "latency_s": 0.0
+        }
+    
+    def _stub_evaluation(self, content_type: str) -> dict:
+        """没有可用模型时的固定评估"""
         evaluation = {
             "evaluation_target": content_type,
             "scores": {
@@ -452,18 +706,147 @@ class ReflectorAgent(BaseAgent):
             "issues_found": [],
             "improvements": []
         }
-        
-        # 模拟反思过程
         avg_score = evaluation["total_score"] / 5
         if avg_score < 8:
             evaluation["issues_found"].append("某些方面可以进一步改进")
             evaluation["improvements"].append("建议添加更多代码示例")
-        
+        return evaluation
+    
+    def _normalize(self, data: Any, content_type: str) -> dict:
+        """校验模型返回的评估，缺少任一维度的分数时抛 ValueError"""
+        if not isinstance(data, dict) or not isinstance(data.get("scores"), dict):
+            raise ValueError("评估缺少 scores")
+        scores = {}
+        for dimension in self.SCORE_DIMENSIONS:
+            value = data["scores"].get(dimension)
+            if isinstance(value, str):
+                value = value.strip().split("/")[0]
+            scores[dimension] = min(10.0, max(0.0, float(value)))
+        return {
+            "evaluation_target": data.get("evaluation_target") or content_type,
+            "scores": scores,
+            "total_score": round(sum(scores.values()), 1),
+            "max_score": 10 * len(self.SCORE_DIMENSIONS),
+            "issues_found": list(data.get("issues_found") or []),
+            "improvements": list(data.get("improvements") or [])
+        }
+    
+    async def _reflect_one(self, content: str, content_type: str, depth: str = "full") -> dict:
+        if not self.llm.available:
+            return self._stub_evaluation(content_type)
+        if depth == "light":
+            response = await self._complete(self.build_messages(
+                f"请快速评估以下 {content_type} 输出的开头部分，只返回包含 scores 的JSON对象，"
+                f"不需要问题和建议：\n\n{content[:self.LIGHT_CONTENT_CHARS]}"
+            ), max_tokens=self.LIGHT_MAX_TOKENS)
+        else:
+            response = await self._complete(self.build_messages(
+                f"请评估以下 {content_type} 输出，只返回一个符合输出格式的JSON对象：\n\n{content}"
+            ))
+        try:
+            return self._normalize(_extract_json(response["output"]), content_type)
+        except (ValueError, TypeError):
+            # 模型输出无法解析时退回固定评估，并标记出来
+            return {**self._stub_evaluation(content_type), "fallback": True}
+    
+    async def reflect(self, content: str, content_type: str = "general", depth: str = "full") -> dict:
+        """反思评估（depth="light" 时只做截断内容、只要分数的轻量评估）"""
+        evaluation = await self._reflect_one(content, content_type, depth)
         print(f"🪞 [{self.name}] 评估完成")
         print(f"   📊 综合得分: {evaluation['total_score']}/{evaluation['max_score']}")
-        
         return evaluation
     
+    def _pack(self, items: list[tuple[str, str]], max_prompt_tokens: int) -> list[list[int]]:
+        """按token预算把待评估内容分组（单条超出预算时独占一组）"""
+        groups: list[list[int]] = []
+        current: list[int] = []
+        used = 0
+        for index, (content, content_type) in enumerate(items):
+            tokens = count_text_tokens(content) + 20
+            if current and used + tokens > max_prompt_tokens:
+                groups.append(current)
+                current, used = [], 0
+            current.append(index)
+            used += tokens
+        if current:
+            groups.append(current)
+        return groups
+    
+    async def _reflect_group(self, items: list[tuple[str, str]], group: list[int]) -> dict[int, dict]:
+        """一次请求评估一组内容；返回能解析的条目（键为 items 下标）"""
+        sections = [
+            f"### [#{n}] 类型: {items[i][1]}\n{items[i][0]}"
+            for n, i in enumerate(group, 1)
+        ]
+        task = (
+            f"请分别评估以下 {len(group)} 条输出。只返回一个JSON数组，每条评估一个对象，"
+            f"包含 \"id\"（即方括号中的编号，整数）以及输出格式中的全部字段。\n\n"
+            + "\n\n".join(sections)
+        )
+        max_tokens = max(self.llm.config_for(self.role.value).max_tokens,
+                         self.OUTPUT_TOKENS_PER_ITEM * len(group))
+        response = await self._complete(self.build_messages(task), max_tokens=max_tokens)
+        self.batch_stats["requests"] += 1
+        self.batch_stats["latency_s"] += response["latency_s"]
+        
+        parsed: dict[int, dict] = {}
+        try:
+            data = _extract_json(response["output"])
+        except ValueError:
+            return parsed
+        if isinstance(data, dict):
+            data = data.get("evaluations") or data.get("items") or []
+        for entry in data if isinstance(data, list) else []:
+            try:
+                n = int(str(entry.get("id")).lstrip("#"))
+                if n < 1 or group[n - 1] in parsed:
+                    continue
+                index = group[n - 1]
+                parsed[index] = self._normalize(entry, items[index][1])
+            except (AttributeError, ValueError, TypeError, IndexError):
+                continue
+        return parsed
+    
+    async def reflect_batch(self, items: list[tuple[str, str]],
+                            max_prompt_tokens: Optional[int] = None) -> list[dict]:
+        """
+        批量评估：在token预算内把多条 (content, content_type) 合并为一次请求
+        
+        系统提示词每组只发送一次；某条评估缺失或无法解析时，该条单独调用 reflect 重试。
+        返回顺序与 items 一致。
+        """
+        if not items:
+            return []
+        if not self.llm.available:
+            return [self._stub_evaluation(content_type) for _, content_type in items]
+        
+        groups = self._pack(items, max_prompt_tokens or self.BATCH_PROMPT_TOKENS)
+        results: dict[int, dict] = {}
+        for parsed in await asyncio.gather(*(self._reflect_group(items, g) for g in groups)):
+            results.update(parsed)
+        
+        missing = [i for i in range(len(items)) if i not in results]
+        retried = await asyncio.gather(*(self._reflect_one(*items[i]) for i in missing))
+        results.update(zip(missing, retried))
+        
+        # 与逐条评估相比：按实际发出的请求（每组一次 + 单独重试）计算，重试多时为负数
+        system_tokens = count_text_tokens(self.prompt)
+        content_tokens = [count_text_tokens(content) for content, _ in items]
+        requests = len(groups) + len(missing)
+        one_by_one = len(items) * system_tokens + sum(content_tokens)
+        issued = requests * system_tokens + sum(content_tokens) + sum(content_tokens[i] for i in missing)
+        stats = self.batch_stats
+        stats["items"] += len(items)
+        stats["requests"] += len(missing)
+        stats["single_fallbacks"] += len(missing)
+        saved = len(items) - requests
+        stats["calls_saved"] += saved
+        stats["prompt_tokens_saved"] += one_by_one - issued
+        print(f"🪞 [{self.name}] 批量评估 {len(items)} 条: {requests} 次请求"
+              f"（{len(groups)} 组 + {len(missing)} 条单独重试）, "
+              + (f"节省 {saved} 次调用" if saved >= 0 else f"比逐条评估多 {-saved} 次调用"))
+        return [results[i] for i in range(len(items))]
+    
     async def optimize_prompt(self, original_prompt: str) -> str:
         """优化提示词"""
         optimized = f"""[优化后的提示词]
@@ -488,8 +871,8 @@ class ReflectorAgent(BaseAgent):
 class ContentAgent(BaseAgent):
     """✍️ 内容创作Agent"""
     
-    def __init__(self):
-        super().__init__(AgentRole.CONTENT, "创作者·Luna")
+    def __init__(self, llm: Optional[LLMClientPool] = None):
+        super().__init__(AgentRole.CONTENT, "创作者·Luna", llm)
     
     async def create_tutorial(self, topic: str, research_data: dict = None) -> str:
         """创建教程"""
@@ -543,6 +926,232 @@ pass
         return template
 
 
+# ============================================================
+# 任务DAG调度（执行Commander输出的依赖结构）
+# ============================================================
+
+@dataclass
+class PlanTask:
+    """Commander计划中的单个任务"""
+    task_id: str
+    assigned_to: AgentRole
+    description: str
+    dependencies: list[str] = field(default_factory=list)
+    success_criteria: list[str] = field(default_factory=list)
+
+
+def _extract_json(text: str) -> Any:
+    """
+    从模型输出中提取JSON值（容忍 ```json 代码块和前后说明文字）
+    
+    依次尝试每个 [ / { 出现的位置，优先返回对象或对象数组，
+    这样 JSON 前面的 "[#1]"、"[1]" 之类说明文字不会被当成结果
+    """
+    decoder = json.JSONDecoder()
+    fallback, found = None, False
+    start = min((i for i in (text.find("["), text.find("{")) if i >= 0), default=-1)
+    while start >= 0:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+        except ValueError:
+            pass
+        else:
+            if isinstance(value, dict) or (
+                    isinstance(value, list) and value and all(isinstance(v, dict) for v in value)):
+                return value
+            if not found:
+                fallback, found = value, True
+        start = min((i for i in (text.find("[", start + 1), text.find("{", start + 1)) if i >= 0),
+                    default=-1)
+    if found:
+        return fallback
+    raise ValueError("输出中没有JSON")
+
+
+def _reflection_content(result: Any) -> str:
+    """
+    反思的输入：只取任务与输出这些稳定字段
+    
+    act 的结果里还有每次都不同的 latency_s 等字段，整体 str() 会让反思请求无法命中卡带
+    """
+    if not isinstance(result, dict):
+        return str(result)
+    return f"任务: {result.get('task', '')}\n\n{result.get('output', '')}"
+
+
+def _parse_role(value: Any) -> AgentRole:
+    """接受 "engineer" / "ENGINEER" / "AgentRole.ENGINEER" 等写法"""
+    if isinstance(value, AgentRole):
+        return value
+    name = str(value).split(".")[-1].strip().lower()
+    try:
+        return AgentRole(name)
+    except ValueError:
+        raise ValueError(f"未知的Agent角色: {value}") from None
+
+
+def _parse_plan_task(item: Any, index: int) -> PlanTask:
+    """校验单个任务；模型输出缺字段或类型不对时统一抛 ValueError"""
+    if isinstance(item, PlanTask):
+        return item
+    if not isinstance(item, dict):
+        raise ValueError(f"第 {index} 个任务不是对象: {item!r}")
+    missing = [key for key in ("task_id", "assigned_to") if key not in item]
+    if missing:
+        raise ValueError(f"第 {index} 个任务缺少字段: {missing}")
+    dependencies = item.get("dependencies") or []
+    criteria = item.get("success_criteria") or []
+    if not isinstance(dependencies, list) or not isinstance(criteria, list):
+        raise ValueError(f"任务 {item['task_id']} 的 dependencies / success_criteria 应为列表")
+    return PlanTask(
+        task_id=str(item["task_id"]),
+        assigned_to=_parse_role(item["assigned_to"]),
+        description=str(item.get("description") or ""),
+        dependencies=[str(d) for d in dependencies],
+        success_criteria=[str(c) for c in criteria],
+    )
+
+
+def parse_commander_plan(plan: Any) -> list[PlanTask]:
+    """
+    把Commander的输出解析为任务列表并校验为DAG
+
+    支持：JSON字符串、任务列表、{"tasks": [...]}、单个任务对象。
+
+    Raises:
+        ValueError: 格式错误、task_id重复、依赖不存在或存在环
+    """
+    if isinstance(plan, str):
+        plan = _extract_json(plan)
+    if isinstance(plan, dict):
+        plan = plan.get("tasks", [plan])
+    if not isinstance(plan, list):
+        raise ValueError(f"计划应为任务列表，实际为 {type(plan).__name__}")
+    tasks = [_parse_plan_task(item, index) for index, item in enumerate(plan)]
+    
+    ids = [t.task_id for t in tasks]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"task_id 重复: {ids}")
+    for task in tasks:
+        missing = set(task.dependencies) - set(ids)
+        if missing:
+            raise ValueError(f"任务 {task.task_id} 依赖不存在的任务: {sorted(missing)}")
+    
+    # Kahn算法检查环
+    indegree = {t.task_id: len(t.dependencies) for t in tasks}
+    children: dict[str, list[str]] = {t.task_id: [] for t in tasks}
+    for task in tasks:
+        for dep in task.dependencies:
+            children[dep].append(task.task_id)
+    ready = [tid for tid, d in indegree.items() if d == 0]
+    visited = 0
+    while ready:
+        tid = ready.pop()
+        visited += 1
+        for child in children[tid]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+    if visited != len(tasks):
+        raise ValueError("任务依赖存在环")
+    return tasks
+
+
+class DAGScheduler:
+    """按波次并行执行DAG：每一波运行所有依赖已完成的任务，上游输出传给下游"""
+    
+    def __init__(self, agents: dict[AgentRole, BaseAgent], max_parallel: Optional[int] = None):
+        self.agents = agents
+        self.max_parallel = max_parallel
+    
+    @staticmethod
+    def build_input(task: PlanTask, outputs: dict[str, Any]) -> str:
+        """任务描述 + 上游任务输出"""
+        if not task.dependencies:
+            return task.description
+        upstream = "\n".join(f"[{dep}] {outputs[dep]}" for dep in task.dependencies)
+        return f"{task.description}\n\n## 上游任务输出\n{upstream}"
+    
+    async def run(self, tasks: list[PlanTask]) -> dict:
+        """执行所有任务；失败任务的下游标记为 skipped"""
+        semaphore = asyncio.Semaphore(self.max_parallel or len(tasks) or 1)
+        by_id = {t.task_id: t for t in tasks}
+        results: dict[str, dict] = {}
+        outputs: dict[str, Any] = {}
+        durations: dict[str, float] = {}
+        waves: list[list[str]] = []
+        pending = list(tasks)
+        started = time.perf_counter()
+        
+        async def run_task(task: PlanTask) -> dict:
+            async with semaphore:
+                t0 = time.perf_counter()
+                try:
+                    agent = self.agents[task.assigned_to]
+                    return await agent.act(self.build_input(task, outputs))
+                finally:
+                    durations[task.task_id] = time.perf_counter() - t0
+        
+        while pending:
+            failed = {tid for tid, r in results.items() if r["status"] != "completed"}
+            for task in [t for t in pending if failed & set(t.dependencies)]:
+                results[task.task_id] = {"status": "skipped", "reason": "上游任务失败"}
+                pending.remove(task)
+            ready = [t for t in pending if all(d in outputs for d in t.dependencies)]
+            if not ready:
+                break
+            waves.append([t.task_id for t in ready])
+            print(f"🌊 第 {len(waves)} 波: {', '.join(waves[-1])}")
+            outcomes = await asyncio.gather(*(run_task(t) for t in ready), return_exceptions=True)
+            for task, outcome in zip(ready, outcomes):
+                pending.remove(task)
+                if isinstance(outcome, Exception):
+                    results[task.task_id] = {"status": "failed", "error": f"{type(outcome).__name__}: {outcome}"}
+                else:
+                    results[task.task_id] = {"status": "completed", "result": outcome}
+                    outputs[task.task_id] = outcome.get("output", outcome) if isinstance(outcome, dict) else outcome
+        
+        wall_clock = time.perf_counter() - started
+        path, path_length = self.critical_path(by_id, durations)
+        summed = sum(durations.values())
+        return {
+            "results": {t.task_id: results[t.task_id] for t in tasks},
+            "waves": waves,
+            "timing": {
+                "wall_clock_s": round(wall_clock, 3),
+                "summed_s": round(summed, 3),
+                "critical_path": path,
+                "critical_path_s": round(path_length, 3),
+                "parallelism": round(summed / wall_clock, 2) if wall_clock > 0 else 1.0,
+                "task_s": {tid: round(d, 3) for tid, d in durations.items()}
+            }
+        }
+    
+    @staticmethod
+    def critical_path(by_id: dict[str, PlanTask], durations: dict[str, float]) -> tuple[list[str], float]:
+        """按实际耗时计算最长依赖链（只考虑已执行的任务）"""
+        finish: dict[str, float] = {}
+        previous: dict[str, Optional[str]] = {}
+        
+        def longest(tid: str) -> float:
+            if tid not in finish:
+                deps = [d for d in by_id[tid].dependencies if d in durations]
+                best = max(deps, key=longest, default=None)
+                previous[tid] = best
+                finish[tid] = durations[tid] + (longest(best) if best else 0.0)
+            return finish[tid]
+        
+        if not durations:
+            return [], 0.0
+        end = max(durations, key=longest)
+        path = []
+        node: Optional[str] = end
+        while node:
+            path.append(node)
+            node = previous[node]
+        return path[::-1], finish[end]
+
+
 # ============================================================
 # Agent协调器 (基于LangGraph模式)
 # ============================================================
@@ -550,29 +1159,85 @@ pass
 class EnhancedOrchestrator:
     """增强版Agent协调器"""
     
-    def __init__(self):
+    def __init__(self, research_cache: Optional[ResearchCache] = None,
+                 llm: Optional[LLMClientPool] = None,
+                 budget: Optional[TokenBudget] = None,
+                 history_dir: Optional[Path] = None,
+                 history_size: int = DEFAULT_HISTORY_SIZE,
+                 mailbox_size: int = DEFAULT_MAILBOX_SIZE,
+                 checkpoints: Optional[CheckpointStore] = None,
+                 reflection_policy: Optional[ReflectionPolicy] = None,
+                 router: Optional[ModelRouter] = None):
+        self.research_cache = research_cache
+        self.checkpoints = checkpoints
+        # 未配置时每个任务都做完整反思
+        self.reflection_policy = reflection_policy
+        # 未配置时各角色使用 ROLE_MODEL_CONFIG 中的固定模型，反思不通过也不升级
+        self.router = router
+        self.llm = llm if llm is not None else get_default_pool()
+        self.budget = budget
+        self.history_size = history_size
+        # 每个协调器实例一个子目录，超出内存上限的历史写入其中
+        self.history_dir = (
+            Path(history_dir) / f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{id(self):x}"
+            if history_dir else None
+        )
         self.agents: dict[AgentRole, BaseAgent] = {}
-        self.message_queue: list[AgentMessage] = []
-        self.execution_history: list[dict] = []
+        self.bus = MessageBus(mailbox_size)
+        self._workers: list[asyncio.Task] = []
+        self.execution_history = self._new_history("orchestrator")
+        self.pipeline_stats: dict = {}
+        self.batch_stats: dict = {}
         
         # 初始化所有Agent
         self._init_agents()
     
     def _init_agents(self):
         """初始化Agent团队"""
-        self.agents[AgentRole.RESEARCHER] = ResearcherAgent()
-        self.agents[AgentRole.REFLECTOR] = ReflectorAgent()
-        self.agents[AgentRole.CONTENT] = ContentAgent()
+        self.agents[AgentRole.RESEARCHER] = ResearcherAgent(cache=self.research_cache, llm=self.llm)
+        self.agents[AgentRole.REFLECTOR] = ReflectorAgent(llm=self.llm)
+        self.agents[AgentRole.CONTENT] = ContentAgent(llm=self.llm)
         # 其他Agent使用基类
         for role in [AgentRole.COMMANDER, AgentRole.PLANNER, 
                      AgentRole.DESIGNER, AgentRole.ENGINEER, AgentRole.REVIEWER]:
             if role not in self.agents:
-                self.agents[role] = BaseAgent(role, f"{role.value.title()}Agent")
+                self.agents[role] = BaseAgent(role, f"{role.value.title()}Agent", self.llm)
+        for agent in self.agents.values():
+            agent.budget = self.budget
+            agent.router = self.router
+            agent.history = self._new_history(agent.role.value)
+            agent.state.messages = self._new_history(f"{agent.role.value}-messages")
         
         print("\n🎭 Agent团队初始化完成:")
         for agent in self.agents.values():
             print(f"   {agent.get_identity()}")
     
+    def start_agents(self, workers_per_agent: int = 1):
+        """为每个Agent启动若干个邮箱消费者（同一角色的多个消费者共享邮箱）"""
+        for agent in self.agents.values():
+            for _ in range(workers_per_agent):
+                self._workers.append(asyncio.create_task(agent.serve(self.bus)))
+    
+    async def stop_agents(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+    
+    async def dispatch(self, task: str, agent_role: AgentRole, context: Any = None,
+                       timeout: Optional[float] = None) -> dict:
+        """通过消息总线把任务交给对应角色的消费者，并等待结果（需先 start_agents）"""
+        return await self.bus.request(AgentMessage(
+            from_agent=AgentRole.COMMANDER,
+            to_agent=agent_role,
+            content={"task": task, "context": context},
+            message_type="request"
+        ), timeout=timeout)
+    
+    def _new_history(self, name: str) -> SpillingHistory:
+        spill_path = self.history_dir / f"{name}.jsonl.gz" if self.history_dir else None
+        return SpillingHistory(self.history_size, spill_path)
+    
     async def execute_with_reflection(self, task: str, agent_role: AgentRole) -> dict:
         """执行任务并进行反思"""
         # 1. 先进行研究
@@ -581,55 +1246,412 @@ class EnhancedOrchestrator:
         
         # 2. 执行任务
         agent = self.agents[agent_role]
-        result = await agent.act(task)
+        result = await agent.act(task, context=research_data)
         
-        # 3. 反思评估
-        reflector = self.agents[AgentRole.REFLECTOR]
-        evaluation = await reflector.reflect(str(result), agent_role.value)
+        # 3. 反思评估（按策略可能轻量化或跳过）
+        evaluation = await self._reflect(result, agent_role, research_data)
         
-        # 4. 记录历史
-        self.execution_history.append({
+        # 4. 反思不通过时用推理模型重做一次
+        result, evaluation = await self._escalate(task, agent_role, research_data, result, evaluation)
+        
+        # 5. 记录历史
+        return self._record_execution({
             "task": task,
-            "agent": agent_role.value,
+            "role": agent_role,
             "result": result,
             "research": research_data,
             "evaluation": evaluation
         })
+    
+    async def _reflect(self, result: Any, agent_role: AgentRole, research: Optional[dict],
+                       force_full: bool = False) -> dict:
+        """
+        按反思策略决定深度后评估；评估结果附带 reflection_depth
         
-        return {
+        force_full=True 时不经策略决策，直接完整反思（结果仍计入策略基线）
+        """
+        reflector = self.agents[AgentRole.REFLECTOR]
+        policy = self.reflection_policy
+        content = _reflection_content(result)
+        if policy is None:
+            evaluation = await reflector.reflect(content, agent_role.value)
+            self._record_score(agent_role, evaluation)
+            return evaluation
+        if force_full:
+            depth, reason, audit = "full", "模型升级后复评", False
+        else:
+            output = str(result.get("output", "")) if isinstance(result, dict) else str(result)
+            depth, reason, audit = policy.decide(agent_role.value, research, output)
+        if depth == "skip":
+            evaluation = policy.skipped_evaluation(agent_role.value, reason)
+        else:
+            evaluation = await reflector.reflect(content, agent_role.value, depth=depth)
+            policy.record(agent_role.value, evaluation, depth, audit)
+        self._record_score(agent_role, evaluation)
+        return {**evaluation, "reflection_depth": depth, "reflection_reason": reason, "audit": audit}
+    
+    def _record_score(self, agent_role: AgentRole, evaluation: dict):
+        """把反思得分交给路由，作为该角色后续选模型的依据"""
+        if self.router is not None and not evaluation.get("fallback"):
+            self.router.record_score(agent_role.value, score_ratio(evaluation))
+    
+    def _needs_escalation(self, agent_role: AgentRole, result: Any, evaluation: Optional[dict]) -> bool:
+        """已经是推理模型、跳过反思、评估为兜底值或没有可用模型时不升级"""
+        if self.router is None or not self.agents[agent_role].llm.available:
+            return False
+        if not isinstance(result, dict) or not evaluation or evaluation.get("fallback"):
+            return False
+        return self.router.should_escalate(result.get("model"), score_ratio(evaluation))
+    
+    async def _escalate(self, task: str, agent_role: AgentRole, research: Optional[dict],
+                        result: Any, evaluation: dict) -> tuple[Any, dict]:
+        """
+        反思得分率低于路由的 escalate_below 时，用 deepseek-reasoner 重做一次并完整反思，
+        保留得分更高的结果
+        """
+        if not self._needs_escalation(agent_role, result, evaluation):
+            return result, evaluation
+        ratio = score_ratio(evaluation)
+        retry = await self.agents[agent_role].act(task, context=research, model=REASONER_MODEL,
+                                                  route_reason=f"反思得分率 {ratio:.2f}，升级重做")
+        retry_evaluation = await self._reflect(retry, agent_role, research, force_full=True)
+        retry_ratio = score_ratio(retry_evaluation)
+        improved = retry_ratio is not None and retry_ratio > ratio
+        self.router.record_escalation(improved)
+        if improved:
+            return retry, {**retry_evaluation, "escalated_from": result.get("model")}
+        return result, {**evaluation, "escalation": {"model": REASONER_MODEL, "score_ratio": retry_ratio}}
+    
+    async def stream_with_reflection(self, task: str, agent_role: AgentRole) -> AsyncIterator[dict]:
+        """
+        execute_with_reflection 的事件流版本：研究、逐段输出、评估依次产出
+        
+        模型同样由路由选择并计入路由统计，但反思不通过时不升级重做：
+        输出已经逐段推送给客户端，无法再替换（评估得分仍计入路由的近期得分）
+        """
+        researcher = self.agents[AgentRole.RESEARCHER]
+        yield {"type": "stage", "stage": "research", "agent": researcher.name}
+        research_data = await researcher.research(task)
+        yield {"type": "research", "agent": researcher.name,
+               "confidence": research_data.get("confidence"),
+               "key_findings": research_data.get("key_findings", [])}
+        
+        result = None
+        yield {"type": "stage", "stage": "act", "agent": self.agents[agent_role].name}
+        async for event in self.agents[agent_role].act_stream(task, context=research_data):
+            if event["type"] == "result":
+                result = event["result"]
+            yield event
+        
+        reflector = self.agents[AgentRole.REFLECTOR]
+        yield {"type": "stage", "stage": "reflect", "agent": reflector.name}
+        evaluation = await self._reflect(result, agent_role, research_data)
+        yield {"type": "evaluation", "agent": reflector.name, "evaluation": evaluation}
+        
+        self._record_execution({
+            "task": task,
+            "role": agent_role,
             "result": result,
             "research": research_data,
             "evaluation": evaluation
+        })
+    
+    async def execute_batch_with_reflection(self, tasks: list[tuple[str, AgentRole]],
+                                            queue_size: int = 2,
+                                            reflect_batch_size: int = 1) -> list[dict]:
+        """
+        批量执行任务：研究 → 执行 → 反思 三级流水线
+        
+        研究第N+1个任务的同时执行第N个、反思第N-1个；级间使用有界队列，
+        下游变慢时上游会被反压而不是无限堆积。结果按输入顺序返回，
+        单个任务失败只记录在该任务的结果中。
+        reflect_batch_size > 1 时，反思阶段把已排队的结果（最多这么多条）合并为一次 reflect_batch。
+        配置了模型路由时，反思不通过的任务在后台用 deepseek-reasoner 重做（escalate 阶段）。
+        """
+        done = object()
+        to_act: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        to_reflect: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        results: list[Optional[dict]] = [None] * len(tasks)
+        stats = {
+            name: {"items": 0, "busy_s": 0.0, "blocked_s": 0.0}
+            for name in ("research", "act", "reflect", "escalate")
         }
+        
+        async def timed(name: str, item: dict, key: str, coro_factory: Callable):
+            """执行一个阶段的工作，异常记录到 item 中（卡带未命中说明回放配置有误，直接抛出）"""
+            if item.get("error"):
+                return
+            t0 = time.perf_counter()
+            try:
+                item[key] = await coro_factory()
+            except CassetteMissError:
+                raise
+            except Exception as e:
+                item["error"] = f"{name}: {type(e).__name__}: {e}"
+            stats[name]["items"] += 1
+            stats[name]["busy_s"] += time.perf_counter() - t0
+        
+        async def forward(name: str, queue: asyncio.Queue, item: Any):
+            t0 = time.perf_counter()
+            await queue.put(item)
+            stats[name]["blocked_s"] += time.perf_counter() - t0
+        
+        async def research_stage():
+            researcher = self.agents[AgentRole.RESEARCHER]
+            for index, (task, role) in enumerate(tasks):
+                item = {"index": index, "task": task, "role": role}
+                await timed("research", item, "research", lambda: researcher.research(task))
+                await forward("research", to_act, item)
+            await to_act.put(done)
+        
+        async def act_stage():
+            while (item := await to_act.get()) is not done:
+                agent = self.agents[item["role"]]
+                await timed("act", item, "result",
+                            lambda: agent.act(item["task"], context=item.get("research")))
+                await forward("act", to_reflect, item)
+            await to_reflect.put(done)
+        
+        async def escalate(item: dict):
+            """反思不通过的任务用推理模型重做；失败时保留原结果"""
+            t0 = time.perf_counter()
+            try:
+                item["result"], item["evaluation"] = await self._escalate(
+                    item["task"], item["role"], item.get("research"), item["result"], item["evaluation"]
+                )
+            except CassetteMissError:
+                raise
+            except Exception as e:
+                item["evaluation"] = {**item["evaluation"], "escalation_error": f"{type(e).__name__}: {e}"}
+            stats["escalate"]["items"] += 1
+            stats["escalate"]["busy_s"] += time.perf_counter() - t0
+            results[item["index"]] = self._record_execution(item)
+        
+        async def reflect_stage():
+            reflector = self.agents[AgentRole.REFLECTOR]
+            # 升级重做在后台进行，不阻塞后续任务的反思
+            escalations: list[asyncio.Task] = []
+            finished = False
+            while not finished:
+                batch = [await to_reflect.get()]
+                # 顺带取走已经排队的结果，一起评估
+                while len(batch) < reflect_batch_size and not to_reflect.empty():
+                    batch.append(to_reflect.get_nowait())
+                if batch[-1] is done:
+                    batch.pop()
+                    finished = True
+                pending = [item for item in batch if not item.get("error")]
+                if len(pending) > 1:
+                    t0 = time.perf_counter()
+                    decisions = {}
+                    if self.reflection_policy is not None:
+                        # 批量评估总是完整评估（light 决定由策略改为 full 计数）；跳过的任务直接填入占位评估
+                        for item in pending:
+                            output = str((item.get("result") or {}).get("output", ""))
+                            depth, reason, audit = self.reflection_policy.decide(
+                                item["role"].value, item.get("research"), output, batched=True
+                            )
+                            if depth == "skip":
+                                item["evaluation"] = {
+                                    **self.reflection_policy.skipped_evaluation(item["role"].value, reason),
+                                    "reflection_depth": depth, "reflection_reason": reason, "audit": audit
+                                }
+                            else:
+                                decisions[item["index"]] = (reason, audit)
+                        pending = [item for item in pending if "evaluation" not in item]
+                    try:
+                        evaluations = await reflector.reflect_batch(
+                            [(_reflection_content(item["result"]), item["role"].value) for item in pending]
+                        )
+                    except CassetteMissError:
+                        raise
+                    except Exception as e:
+                        for item in pending:
+                            item["error"] = f"reflect: {type(e).__name__}: {e}"
+                    else:
+                        for item, evaluation in zip(pending, evaluations):
+                            if item["index"] in decisions:
+                                reason, audit = decisions[item["index"]]
+                                self.reflection_policy.record(item["role"].value, evaluation, "full", audit)
+                                evaluation = {**evaluation, "reflection_depth": "full",
+                                              "reflection_reason": reason, "audit": audit}
+                            self._record_score(item["role"], evaluation)
+                            item["evaluation"] = evaluation
+                    stats["reflect"]["items"] += len(pending)
+                    stats["reflect"]["busy_s"] += time.perf_counter() - t0
+                else:
+                    for item in pending:
+                        await timed("reflect", item, "evaluation",
+                                    lambda: self._reflect(item["result"], item["role"], item.get("research")))
+                for item in batch:
+                    if not item.get("error") and self._needs_escalation(
+                            item["role"], item.get("result"), item.get("evaluation")):
+                        escalations.append(asyncio.create_task(escalate(item)))
+                    else:
+                        results[item["index"]] = self._record_execution(item)
+            await asyncio.gather(*escalations)
+        
+        started = time.perf_counter()
+        await asyncio.gather(research_stage(), act_stage(), reflect_stage())
+        wall_clock = time.perf_counter() - started
+        
+        for stage in stats.values():
+            stage["throughput_per_s"] = round(stage["items"] / stage["busy_s"], 2) if stage["busy_s"] else None
+            stage["busy_s"] = round(stage["busy_s"], 3)
+            stage["blocked_s"] = round(stage["blocked_s"], 3)
+        summed = sum(stage["busy_s"] for stage in stats.values())
+        self.batch_stats = {
+            "tasks": len(tasks),
+            "failed": sum(1 for r in results if r and r.get("error")),
+            "wall_clock_s": round(wall_clock, 3),
+            "sequential_estimate_s": round(summed, 3),
+            "stages": stats
+        }
+        print(f"⏱️ 流水线批处理 {len(tasks)} 个任务: 墙钟 {wall_clock:.2f}s / 串行估计 {summed:.2f}s")
+        return results
+    
+    def _record_execution(self, item: dict) -> dict:
+        """记录一次研究-执行-反思的结果"""
+        outcome = {
+            "result": item.get("result"),
+            "research": item.get("research"),
+            "evaluation": item.get("evaluation")
+        }
+        if item.get("error"):
+            outcome["error"] = item["error"]
+        self.execution_history.append({
+            "task": item["task"],
+            "agent": item["role"].value,
+            **outcome
+        })
+        return outcome
     
-    async def run_content_improvement_pipeline(self, weeks: list[int]) -> dict:
-        """运行内容改进流水线"""
+    async def run_plan(self, plan: Any, max_parallel: Optional[int] = None) -> dict:
+        """按Commander的任务依赖执行计划（同一波次内的任务并行）"""
+        tasks = parse_commander_plan(plan)
+        print(f"\n🗺️ 执行计划: {len(tasks)} 个任务")
+        outcome = await DAGScheduler(self.agents, max_parallel).run(tasks)
+        timing = outcome["timing"]
+        print(f"⏱️ 墙钟 {timing['wall_clock_s']}s, 关键路径 {' → '.join(timing['critical_path'])} "
+              f"({timing['critical_path_s']}s), 并行度 {timing['parallelism']}x")
+        self.execution_history.append({"plan": [t.task_id for t in tasks], **outcome})
+        return outcome
+    
+    async def plan_and_run(self, goal: str, max_parallel: Optional[int] = None) -> dict:
+        """让Commander分解目标，再按其输出的依赖结构执行"""
+        plan = await self.agents[AgentRole.COMMANDER].act(goal)
+        return await self.run_plan(plan["output"], max_parallel)
+    
+    async def run_content_improvement_pipeline(self, weeks: list[int],
+                                               max_concurrency: int = 1,
+                                               force_refresh: bool = False,
+                                               run_id: Optional[str] = None) -> dict:
+        """
+        运行内容改进流水线
+
+        各周之间相互独立：max_concurrency > 1 时并发处理多个周（信号量限流），
+        结果仍按 weeks 的顺序返回；单周失败只影响该周。
+        force_refresh=True 时忽略研究缓存重新研究。
+        配置了检查点存储时，每个完成的步骤都会落盘；传入之前的 run_id 可跳过已完成的步骤。
+        """
         print("\n" + "="*60)
-        print("🚀 启动内容改进流水线")
+        print(f"🚀 启动内容改进流水线 (并发度: {max_concurrency})")
         print("="*60)
         
-        results = {}
-        
-        for week in weeks:
-            print(f"\n📅 处理 Week {week}...")
-            
-            # 1. 研究最新内容
-            topic = f"Week {week} AI工程师课程内容"
-            research = await self.agents[AgentRole.RESEARCHER].research(topic)
-            
-            # 2. 反思现有内容
-            evaluation = await self.agents[AgentRole.REFLECTOR].reflect(
-                topic, "curriculum_content"
-            )
-            
-            results[f"week{week}"] = {
-                "research": research,
-                "evaluation": evaluation,
-                "status": "analyzed"
-            }
+        completed: dict[str, dict] = {}
+        if self.checkpoints is not None:
+            resuming = run_id is not None
+            run_id = run_id or new_run_id()
+            self.checkpoints.start_run(run_id, "content_improvement", {"weeks": weeks})
+            completed = self.checkpoints.completed(run_id)
+            print(f"💾 run_id={run_id}" + (f"（续跑，已完成 {len(completed)} 步）" if resuming else ""))
+        
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        latencies: dict[int, float] = {}
+        
+        async def process(week: int) -> dict:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    return await self._analyze_week(week, force_refresh, run_id, completed)
+                except BudgetExceededError as e:
+                    print(f"💰 Week {week} 已跳过: {e}")
+                    return {"status": "failed", "error": f"budget_exceeded: {e}"}
+                except CassetteMissError:
+                    raise
+                except Exception as e:
+                    print(f"❌ Week {week} 处理失败: {e}")
+                    return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+                finally:
+                    latencies[week] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(process(week) for week in weeks))
+        wall_clock = time.perf_counter() - started
+        
+        results = {f"week{week}": outcome for week, outcome in zip(weeks, outcomes)}
+        
+        summed = sum(latencies.values())
+        self.pipeline_stats = {
+            "run_id": run_id,
+            "weeks": len(weeks),
+            "max_concurrency": max_concurrency,
+            "failed": sum(1 for r in outcomes if r["status"] == "failed"),
+            "resumed_steps": len(completed),
+            "wall_clock_s": round(wall_clock, 3),
+            "summed_latency_s": round(summed, 3),
+            "slowest_week_s": round(max(latencies.values(), default=0.0), 3),
+            "speedup": round(summed / wall_clock, 2) if wall_clock > 0 else 1.0
+        }
+        print(f"⏱️ 墙钟时间 {wall_clock:.2f}s / 累计耗时 {summed:.2f}s "
+              f"→ 加速比 {self.pipeline_stats['speedup']}x")
         
         return results
     
+    async def _checkpointed(self, run_id: Optional[str], step: str, completed: dict[str, dict],
+                            agent: BaseAgent, coro_factory: Callable) -> Any:
+        """已完成的步骤直接取检查点结果（并恢复Agent状态），否则执行后写入检查点"""
+        saved = completed.get(step)
+        if saved is not None:
+            if saved["agent_state"]:
+                agent.state.restore(saved["agent_state"])
+            print(f"💾 跳过已完成步骤: {step}")
+            return saved["result"]
+        result = await coro_factory()
+        if self.checkpoints is not None and run_id is not None:
+            await asyncio.to_thread(
+                self.checkpoints.save, run_id, step, result, agent.state.snapshot()
+            )
+        return result
+    
+    async def _analyze_week(self, week: int, force_refresh: bool = False,
+                            run_id: Optional[str] = None,
+                            completed: Optional[dict[str, dict]] = None) -> dict:
+        """分析单个周：研究最新内容 + 反思现有内容（两步分别写检查点）"""
+        print(f"\n📅 处理 Week {week}...")
+        completed = completed or {}
+        researcher = self.agents[AgentRole.RESEARCHER]
+        reflector = self.agents[AgentRole.REFLECTOR]
+        
+        # 1. 研究最新内容
+        topic = f"Week {week} AI工程师课程内容"
+        research = await self._checkpointed(
+            run_id, f"week{week}/research", completed, researcher,
+            lambda: researcher.research(topic, force_refresh)
+        )
+        
+        # 2. 反思现有内容
+        evaluation = await self._checkpointed(
+            run_id, f"week{week}/evaluation", completed, reflector,
+            lambda: reflector.reflect(topic, "curriculum_content")
+        )
+        
+        return {
+            "research": research,
+            "evaluation": evaluation,
+            "status": "analyzed"
+        }
+    
     def get_report(self) -> str:
         """生成执行报告"""
         report = """
@@ -639,7 +1661,67 @@ class EnhancedOrchestrator:
 """
         report += f"║  Agent数量: {len(self.agents)}                              ║\n"
         report += f"║  执行记录: {len(self.execution_history)} 条                 ║\n"
-        report += f"║  消息队列: {len(self.message_queue)} 条                     ║\n"
+        bus = self.bus.snapshot()
+        report += (f"║  消息总线: 积压 {sum(bus['mailboxes'].values())} 条, "
+                   f"待回复 {bus['pending_requests']}, 已处理 {bus.get('responded', 0)}    ║\n")
+        if self.research_cache is not None:
+            cache = self.research_cache.stats
+            report += f"║  研究缓存: 命中 {cache['hits']} / 未命中 {cache['misses']}        ║\n"
+        for agent, stats in self.llm.report().items():
+            report += (f"║  {agent}: {stats['calls']} 次调用, 平均 {stats['avg_latency_s']}s, "
+                       f"tokens {stats['prompt_tokens']}→{stats['completion_tokens']}   ║\n")
+        resilience = self.llm.resilience_report()
+        if resilience["roles"]:
+            report += (f"║  重试 {resilience['retries']} 次, 超时 {resilience['deadline_exceeded']} 次, "
+                       f"对冲 {resilience['hedges_fired']} 次（胜出 {resilience['hedge_wins']}，"
+                       f"估计节省 {resilience['estimated_saved_s']}s）, 额外计费请求 "
+                       f"{sum(stats['extra_requests'] for stats in self.llm.report().values())} 次   ║\n")
+            for role, latency in resilience["roles"].items():
+                report += (f"║  {role} 延迟 p95/p99: 单次 {latency['attempt']['p95']}/{latency['attempt']['p99']}s, "
+                           f"整次 {latency['call']['p95']}/{latency['call']['p99']}s   ║\n")
+        for role, cache in self.llm.cache_report().items():
+            report += (f"║  前缀缓存 {role}: 命中率 {cache['hit_rate']:.0%} "
+                       f"({cache['hit_tokens']}/{cache['hit_tokens'] + cache['miss_tokens']} tokens)   ║\n")
+        if self.budget is not None:
+            usage = self.budget.summary()
+            run = usage["run"]
+            report += (f"║  Token预算: {run['tokens_in']}→{run['tokens_out']}, "
+                       f"上限 {run['limit'] or '不限'}, 估算费用 ${run['cost_usd']:.4f}   ║\n")
+            for agent, stats in usage["agents"].items():
+                report += (f"║  {agent}: tokens {stats['tokens_in']}→{stats['tokens_out']}, "
+                           f"${stats['cost_usd']:.4f}, {stats['tokens_out_per_s']} tok/s   ║\n")
+        if self.router is not None:
+            routing = self.router.report()
+            for model, route in routing["routes"].items():
+                report += (f"║  路由 {model}: {route['calls']} 次, 平均 {route['avg_latency_s']}s, "
+                           f"tokens {route['tokens_in']}→{route['tokens_out']}, "
+                           f"${route['cost_usd']:.4f}（每次 ${route['avg_cost_usd']:.5f}）   ║\n")
+            escalations = routing["escalations"]
+            if escalations:
+                report += (f"║  模型升级: {escalations['total']} 次, "
+                           f"得分提升 {escalations.get('improved', 0)} 次   ║\n")
+        if self.reflection_policy is not None:
+            for role, quality in self.reflection_policy.summary().items():
+                decisions = quality["decisions"]
+                report += (f"║  反思策略 {role}: 完整 {decisions.get('full', 0)} / 轻量 {decisions.get('light', 0)} / "
+                           f"跳过 {decisions.get('skip', 0)} / 抽检 {decisions.get('audit', 0)}, "
+                           f"基线 {quality['baseline']}, 漂移 {quality['drift']}"
+                           f"{' ⚠️已暂停降级' if quality['suspended'] else ''}   ║\n")
+        reflection = self.agents[AgentRole.REFLECTOR].batch_stats
+        if reflection["items"]:
+            report += (f"║  批量反思: {reflection['items']} 条 / {reflection['requests']} 次请求, "
+                       f"单独重试 {reflection['single_fallbacks']}, "
+                       + (f"节省 {reflection['calls_saved']} 次调用" if reflection["calls_saved"] >= 0
+                          else f"多用 {-reflection['calls_saved']} 次调用")
+                       + (f" (≈节省 {reflection['prompt_tokens_saved']} 提示词token), "
+                          if reflection["prompt_tokens_saved"] >= 0
+                          else f" (≈多用 {-reflection['prompt_tokens_saved']} 提示词token), ")
+                       + f"平均每条 {reflection['latency_s'] / reflection['items']:.2f}s   ║\n")
+        if self.pipeline_stats:
+            stats = self.pipeline_stats
+            report += (f"║  流水线: {stats['weeks']} 周, 并发 {stats['max_concurrency']}, 失败 {stats['failed']}, "
+                       f"续跑跳过 {stats['resumed_steps']} 步   ║\n")
+            report += f"║  墙钟 {stats['wall_clock_s']}s / 累计 {stats['summed_latency_s']}s, 加速 {stats['speedup']}x   ║\n"
         report += "╚══════════════════════════════════════════════════════════════╝\n"
         
         return report
@@ -662,10 +1744,20 @@ async def main():
     """)
     
     # 创建协调器
-    orchestrator = EnhancedOrchestrator()
+    orchestrator = EnhancedOrchestrator(
+        research_cache=ResearchCache(),
+        checkpoints=CheckpointStore(),
+        history_dir=DEFAULT_HISTORY_DIR,
+        budget=TokenBudget(run_limit=int(os.getenv("AGENT_RUN_TOKEN_BUDGET", "500000"))),
+        # AGENT_MODEL_ROUTING=0 时所有角色固定使用 ROLE_MODEL_CONFIG 中的模型
+        router=ModelRouter() if os.getenv("AGENT_MODEL_ROUTING", "1") != "0" else None
+    )
     
     # 运行内容改进流水线
-    results = await orchestrator.run_content_improvement_pipeline([1, 2, 3, 4, 5, 6])
+    # 崩溃后以 AGENT_RESUME_RUN_ID=<上次打印的 run_id> 重新运行即可跳过已完成的步骤
+    results = await orchestrator.run_content_improvement_pipeline(
+        [1, 2, 3, 4, 5, 6], max_concurrency=4, run_id=os.getenv("AGENT_RESUME_RUN_ID")
+    )
     
     # 打印报告
     print(orchestrator.get_report())
@@ -20,17 +20,122 @@
     python -m uvicorn webapp.app:app --reload --port 8080
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
+from pydantic import BaseModel, Field
+from typing import Optional
+import asyncio
 import json
+import os
+import time
+
+from webapp.admission import AdmissionController, AdmissionMiddleware
+from webapp.agent_runs import RunRegistry, TooManyRunsError, require_runs_token
+from webapp.bundles import BundleCache, range_file_response
+from webapp.content_index import ContentIndex, ChangeFeed, compute_stats, content_hash, watch_content
+from webapp.profiling import debug_router
+from webapp.related import RelatedGraph
+
+
+# 内容变更轮询间隔（秒）与SSE心跳间隔
+CONTENT_WATCH_INTERVAL = float(os.getenv("CONTENT_WATCH_INTERVAL", "5"))
+SSE_HEARTBEAT_SECONDS = 15
+
+# 重接口准入控制：每客户端令牌桶 + 全局在途上限
+admission = AdmissionController(
+    rate=float(os.getenv("ADMISSION_RATE", "5")),
+    burst=float(os.getenv("ADMISSION_BURST", "20")),
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")),
+    # 部署在反向代理之后时设为代理层数（Render 为 1），否则直接使用连接的对端地址
+    trusted_proxy_hops=int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+)
+
+# 冷启动预热状态（/api/ready）
+PROCESS_START = time.perf_counter()
+warmup_state = {"ready": False, "steps": {}, "error": None, "degraded": {}}
+# 内容索引构建失败时的重试间隔（秒），用完后按最后一个间隔一直重试
+WARMUP_RETRY_DELAYS = (1, 2, 5, 10, 30)
+
+
+def _load_related_graph():
+    global related_graph
+    related_graph = RelatedGraph.load()
+
+
+async def warm_up():
+    """
+    预热：在服务开始接受连接之后再构建索引与缓存
+
+    只有内容索引是必需步骤：失败时按 WARMUP_RETRY_DELAYS 重试，成功后才标记就绪。
+    相似度图、主页模板是可选步骤：失败时记入 degraded，不阻塞就绪（/api/related 返回503）。
+    预热完成前各接口仍可用：/api/content 直接读盘，/api/related 返回503。
+    """
+    steps = warmup_state["steps"]
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        t = time.perf_counter()
+        try:
+            await asyncio.to_thread(content_index.refresh)
+        except Exception as e:
+            warmup_state["error"] = f"content_index: {type(e).__name__}: {e}"
+            delay = WARMUP_RETRY_DELAYS[min(attempt, len(WARMUP_RETRY_DELAYS) - 1)]
+            attempt += 1
+            print(f"⚠️ 内容索引构建失败（第 {attempt} 次），{delay}s 后重试: {e}")
+            await asyncio.sleep(delay)
+            continue
+        steps["content_index_ms"] = round((time.perf_counter() - t) * 1000, 1)
+        warmup_state["error"] = None
+        break
+
+    for name, step, threaded in (("related_graph", _load_related_graph, True),
+                                 ("html_template", get_home_page, False)):
+        t = time.perf_counter()
+        try:
+            if threaded:
+                await asyncio.to_thread(step)
+            else:
+                step()
+        except Exception as e:
+            warmup_state["degraded"][name] = f"{type(e).__name__}: {e}"
+            continue
+        steps[f"{name}_ms"] = round((time.perf_counter() - t) * 1000, 1)
+    warmup_state["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    warmup_state["ready_after_ms"] = round((time.perf_counter() - PROCESS_START) * 1000, 1)
+    warmup_state["ready"] = True
+    # 索引就绪后才开始轮询，避免两个线程同时刷新
+    await watch_content(content_index, change_feed, CONTENT_WATCH_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时不做阻塞工作，预热放到后台任务中"""
+    task = asyncio.create_task(warm_up())
+    yield
+    task.cancel()
+    await agent_runs.shutdown()
+
 
 app = FastAPI(
     title="AI工程师2026速成训练营",
     version="3.0.0",
-    description="12周从入门到精通的AI工程师学习平台"
+    description="12周从入门到精通的AI工程师学习平台",
+    lifespan=lifespan
 )
 
+# 重接口的全局在途上限（按路由的限速见各接口的 Depends(admission)）；
+# /api/content/events 等 SSE 长连接不计入
+app.add_middleware(
+    AdmissionMiddleware, controller=admission,
+    paths=("/api/content", "/api/content/delta", "/api/bundle/", "/api/agents/runs")
+)
+
+# 调试端点（默认关闭，见 webapp/profiling.py）
+app.include_router(debug_router)
+
 # 项目根目录
 BASE_DIR = Path(__file__).parent.parent
 
@@ -262,41 +367,264 @@ def read_file_content(path: str) -> str:
     return full_path.read_text(encoding='utf-8')
 
 
+# 内容索引与变更广播
+content_index = ContentIndex(BASE_DIR, CURRICULUM)
+change_feed = ChangeFeed()
+
+# 每周离线下载包（磁盘缓存）
+bundle_cache = BundleCache()
+
+# 离线生成的相关教程近邻表（python -m webapp.related）
+related_graph: RelatedGraph | None = None
+
+# 网页发起的Agent运行（事件经SSE推送）
+agent_runs = RunRegistry()
+
+# 内容ID -> 课程条目信息
+ITEM_META = {
+    item["path"]: {"name": item["name"], "icon": item["icon"], "week": week_id}
+    for week_id, week in CURRICULUM.items()
+    for kind in ("tutorials", "projects", "exercises")
+    for item in week[kind]
+}
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home():
     """主页"""
-    return get_enhanced_html_template()
+    return HTMLResponse(get_home_page())
+
+
+@app.get("/sw.js")
+async def service_worker():
+    """离线优先的 Service Worker（必须位于根路径以覆盖整个站点）"""
+    return Response(
+        get_service_worker_js(),
+        media_type="application/javascript",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.get("/api/manifest")
+async def get_manifest():
+    """离线缓存清单：应用外壳版本 + 每个内容的版本哈希 + 每周内容顺序"""
+    return {
+        "shell": content_hash(get_home_page()),
+        "content": content_index.snapshot(),
+        "weeks": {
+            week_id: [
+                item["path"]
+                for kind in ("tutorials", "projects", "exercises")
+                for item in week[kind]
+            ]
+            for week_id, week in CURRICULUM.items()
+        }
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 指标"""
+    return admission.metrics()
+
+
+@app.get("/api/ready")
+async def ready():
+    """就绪检查：预热完成前返回503"""
+    body = {
+        **warmup_state,
+        "uptime_ms": round((time.perf_counter() - PROCESS_START) * 1000, 1)
+    }
+    return JSONResponse(body, status_code=200 if warmup_state["ready"] else 503)
+
+
+_curriculum_cache = {"version": -1, "data": None}
+
+
+def item_with_stats(item: dict) -> dict:
+    """课程条目 + 预计算的阅读统计"""
+    entry = content_index.get(item["path"])
+    if entry is None or not entry.stats:
+        return item
+    return {**item, **entry.stats}
 
 
 @app.get("/api/curriculum")
 async def get_curriculum():
-    """获取课程大纲"""
-    return CURRICULUM
+    """获取课程大纲（每个条目附带从真实内容计算的阅读统计）"""
+    if _curriculum_cache["version"] != content_index.version:
+        _curriculum_cache["data"] = {
+            week_id: {
+                **week,
+                **{
+                    kind: [item_with_stats(item) for item in week[kind]]
+                    for kind in ("tutorials", "projects", "exercises")
+                }
+            }
+            for week_id, week in CURRICULUM.items()
+        }
+        _curriculum_cache["version"] = content_index.version
+    return _curriculum_cache["data"]
+
 
 
-@app.get("/api/content")
+@app.get("/api/content", dependencies=[Depends(admission)])
 async def get_content(path: str):
     """获取文件内容"""
     try:
-        content = read_file_content(path)
+        entry = content_index.get(path)
+        if entry is not None and entry.hash:
+            content, version, stats = entry.text, entry.hash, entry.stats
+        else:
+            content = read_file_content(path)
+            version = content_hash(content.encode('utf-8'))
+            stats = compute_stats(content, is_code=path.endswith('.py'))
         file_type = "python" if path.endswith('.py') else "markdown"
-        return {"content": content, "type": file_type, "path": path}
+        return {"content": content, "type": file_type, "path": path, "hash": version, "stats": stats}
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@app.get("/api/content/delta", dependencies=[Depends(admission)])
+async def get_content_delta(path: str, since: str):
+    """获取从客户端版本 since 到当前版本的行级增量"""
+    delta = content_index.delta(path, since)
+    if delta is None:
+        raise HTTPException(status_code=404, detail=f"内容不存在: {path}")
+    return delta
+
+
+@app.get("/api/content/events")
+async def content_events():
+    """SSE：推送内容变更（内容ID + 新版本哈希）"""
+    queue = change_feed.subscribe()
+
+    def sse(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def stream():
+        try:
+            # 连接（或重连）时先发送完整版本快照，客户端据此补齐错过的更新
+            yield sse("snapshot", content_index.snapshot())
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event.get("resync"):
+                    yield sse("snapshot", content_index.snapshot())
+                else:
+                    yield sse("changed", event)
+        finally:
+            change_feed.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/related/{content_id:path}")
+async def get_related(content_id: str, limit: int = 5):
+    """获取相关教程（查表，不做逐请求打分）"""
+    if related_graph is None:
+        detail = "服务预热中" if not warmup_state["ready"] else "相似度图尚未生成，请运行 python -m webapp.related"
+        raise HTTPException(status_code=503, detail=detail)
+    neighbors = related_graph.related(content_id, limit)
+    if neighbors is None:
+        raise HTTPException(status_code=404, detail=f"内容不存在: {content_id}")
+    return {
+        "id": content_id,
+        "related": [
+            {"id": cid, "score": score, **ITEM_META.get(cid, {})}
+            for cid, score in neighbors
+        ]
+    }
+
+
+@app.get("/api/bundle/{week}", dependencies=[Depends(admission)])
+async def get_bundle(week: str, request: Request):
+    """下载某一周全部教程/项目/练习的zip包（支持断点续传）"""
+    if week not in CURRICULUM:
+        raise HTTPException(status_code=404, detail=f"不存在的周: {week}")
+    if not warmup_state["ready"]:
+        raise HTTPException(status_code=503, detail="服务预热中", headers={"Retry-After": "1"})
+    paths = dict.fromkeys(
+        item["path"]
+        for kind in ("tutorials", "projects", "exercises")
+        for item in CURRICULUM[week][kind]
+    )
+    entries = [content_index.get(p) for p in paths]
+    entries = [e for e in entries if e is not None and e.hash]
+    bundle, key = await bundle_cache.get(week, entries)
+    try:
+        return range_file_response(request, bundle, key, "application/zip", f"{week}.zip")
+    except FileNotFoundError:
+        # 包在返回路径后被清理（内容又更新了一次）：重新获取一次
+        bundle, key = await bundle_cache.get(week, entries)
+        return range_file_response(request, bundle, key, "application/zip", f"{week}.zip")
+
+
+class AgentRunRequest(BaseModel):
+    task: str = Field(min_length=1, max_length=2000)
+    role: str = "engineer"
+
+
+@app.post("/api/agents/runs", status_code=202, dependencies=[Depends(require_runs_token), Depends(admission)])
+async def create_agent_run(body: AgentRunRequest):
+    """启动一次 研究 → 执行 → 反思 运行，立即返回运行ID"""
+    try:
+        run = agent_runs.start(body.task, body.role)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"未知角色: {body.role}")
+    except TooManyRunsError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return {**run.to_dict(), "events_url": f"/api/agents/runs/{run.run_id}/events"}
+
+
+@app.get("/api/agents/runs/{run_id}")
+async def get_agent_run(run_id: str):
+    run = agent_runs.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"运行不存在: {run_id}")
+    return run.to_dict()
+
+
+@app.get("/api/agents/runs/{run_id}/events")
+async def agent_run_events(run_id: str, last_event_id: Optional[int] = Header(default=None)):
+    """SSE：推送运行事件；重连时按 Last-Event-ID 补发缓冲中的事件"""
+    run = agent_runs.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"运行不存在: {run_id}")
+    return StreamingResponse(
+        agent_runs.stream(run, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/stats")
 async def get_stats():
     """获取课程统计数据"""
     total_tutorials = sum(len(w["tutorials"]) for w in CURRICULUM.values())
     total_projects = sum(len(w["projects"]) for w in CURRICULUM.values())
     total_exercises = sum(len(w["exercises"]) for w in CURRICULUM.values())
-    total_duration = sum(
-        sum(t.get("duration", 30) for t in w["tutorials"]) +
-        sum(p.get("duration", 60) for p in w["projects"]) +
-        sum(e.get("duration", 20) for e in w["exercises"])
-        for w in CURRICULUM.values()
-    )
+
+    # 阅读时间取自内容索引的预计算结果；预热完成前退回手填的 duration
+    default_minutes = {"tutorials": 30, "projects": 60, "exercises": 20}
+    total_minutes = total_words = total_code_blocks = 0
+    for week in CURRICULUM.values():
+        for kind, default in default_minutes.items():
+            for item in week[kind]:
+                entry = content_index.get(item["path"])
+                if entry is not None and entry.stats:
+                    total_minutes += entry.stats["reading_minutes"]
+                    total_words += entry.stats["words"]
+                    total_code_blocks += entry.stats["code_blocks"]
+                else:
+                    total_minutes += item.get("duration", default)
     
     return {
         "weeks": len(CURRICULUM),
@@ -304,10 +632,18 @@ async def get_stats():
         "projects": total_projects,
         "exercises": total_exercises,
         "total_items": total_tutorials + total_projects + total_exercises,
-        "estimated_hours": round(total_duration / 60, 1)
+        "estimated_hours": round(total_minutes / 60, 1),
+        "total_words": total_words,
+        "code_blocks": total_code_blocks
     }
 
 
+@lru_cache(maxsize=1)
+def get_home_page() -> bytes:
+    """主页HTML只编码一次"""
+    return get_enhanced_html_template().encode("utf-8")
+
+
 def get_enhanced_html_template():
     """返回增强版HTML模板 - 全新2026 Premium设计"""
     return '''<!DOCTYPE html>
@@ -1339,6 +1675,114 @@ def get_enhanced_html_template():
             }
         };
         
+        // 内容同步：缓存已加载内容及其版本哈希，通过SSE接收变更并按增量更新
+        const ContentSync = {
+            cache: {},
+            latest: {},
+            weeks: null,
+
+            contentUrl(path) {
+                // 带版本哈希的URL可被 Service Worker 永久缓存
+                const url = `/api/content?path=${encodeURIComponent(path)}`;
+                return this.latest[path] ? `${url}&v=${this.latest[path]}` : url;
+            },
+
+            async loadManifest() {
+                try {
+                    const res = await fetch('/api/manifest');
+                    const manifest = await res.json();
+                    Object.assign(this.latest, manifest.content);
+                    this.weeks = manifest.weeks;
+                    if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+                        navigator.serviceWorker.controller.postMessage({ type: 'manifest', content: manifest.content });
+                    }
+                } catch (e) {}
+            },
+
+            prefetchNext(path, count = 3) {
+                // 空闲时预取当前周接下来的内容
+                if (!this.weeks || !navigator.serviceWorker || !navigator.serviceWorker.controller) return;
+                const paths = Object.values(this.weeks).find(list => list.includes(path));
+                if (!paths) return;
+                const start = paths.indexOf(path) + 1;
+                const urls = paths.slice(start, start + count).map(p => this.contentUrl(p));
+                const send = () => navigator.serviceWorker.controller &&
+                    navigator.serviceWorker.controller.postMessage({ type: 'prefetch', urls });
+                (window.requestIdleCallback || ((cb) => setTimeout(cb, 200)))(send);
+            },
+
+            splitLines(text) {
+                const NL = String.fromCharCode(10);
+                const parts = text.split(NL);
+                const lines = parts.slice(0, -1).map(p => p + NL);
+                if (parts[parts.length - 1]) lines.push(parts[parts.length - 1]);
+                return lines;
+            },
+
+            applyOps(text, ops) {
+                const lines = this.splitLines(text);
+                for (let i = ops.length - 1; i >= 0; i--) {
+                    const [start, end, replacement] = ops[i];
+                    lines.splice(start, end - start, replacement);
+                }
+                return lines.join('');
+            },
+
+            async get(path) {
+                const cached = this.cache[path];
+                if (cached && (!this.latest[path] || this.latest[path] === cached.hash)) {
+                    return cached;
+                }
+                if (cached) {
+                    try {
+                        return await this.patch(path, cached);
+                    } catch (e) {
+                        console.warn('增量更新失败，改为全量加载:', e);
+                    }
+                }
+                const res = await fetch(this.contentUrl(path));
+                if (!res.ok) throw new Error((await res.json()).detail || '加载失败');
+                const data = await res.json();
+                this.cache[path] = data;
+                this.latest[path] = data.hash;
+                return data;
+            },
+
+            async patch(path, cached) {
+                const res = await fetch(`/api/content/delta?path=${encodeURIComponent(path)}&since=${cached.hash}`);
+                if (!res.ok) throw new Error('delta ' + res.status);
+                const delta = await res.json();
+                const content = delta.full ? delta.content : this.applyOps(cached.content, delta.ops);
+                const data = { ...cached, content, hash: delta.hash, stats: delta.stats || cached.stats };
+                this.cache[path] = data;
+                this.latest[path] = delta.hash;
+                return data;
+            },
+
+            onVersion(path, hash) {
+                this.latest[path] = hash;
+                const cached = this.cache[path];
+                if (cached && cached.hash !== hash && path === currentPath) {
+                    // 当前打开的页面有更新：只拉取差异并重新渲染
+                    const scrollY = window.scrollY;
+                    loadContent(path).then(() => window.scrollTo(0, scrollY));
+                }
+            },
+
+            connect() {
+                if (!window.EventSource) return;
+                const source = new EventSource('/api/content/events');
+                source.addEventListener('snapshot', (e) => {
+                    const versions = JSON.parse(e.data);
+                    for (const [path, hash] of Object.entries(versions)) this.onVersion(path, hash);
+                });
+                source.addEventListener('changed', (e) => {
+                    const data = JSON.parse(e.data);
+                    this.onVersion(data.id, data.hash);
+                });
+            }
+        };
+        
         // 搜索功能（改进版：保留Week上下文）
         const SearchManager = {
             search(query) {
@@ -1421,6 +1865,11 @@ def get_enhanced_html_template():
                 renderNav();
                 renderHome();
                 ProgressManager.updateUI();
+                if ('serviceWorker' in navigator) {
+                    navigator.serviceWorker.register('/sw.js').catch(e => console.warn('Service Worker 注册失败:', e));
+                }
+                await ContentSync.loadManifest();
+                ContentSync.connect();
                 
                 // 搜索事件
                 document.getElementById('search-input').addEventListener('input', (e) => {
@@ -1431,6 +1880,42 @@ def get_enhanced_html_template():
             }
         }
         
+        // 阅读时长标签（来自内容索引；尚未索引的条目不显示）
+        function readingTag(minutes) {
+            return minutes ? `<span class="duration-tag">${minutes} 分钟</span>` : '';
+        }
+        
+        // 打开内容后用 /api/content 返回的统计更新导航中的时长
+        function setReadingMinutes(path, minutes) {
+            if (!minutes) return;
+            for (const week of Object.values(curriculum)) {
+                for (const item of [...week.tutorials, ...week.projects, ...week.exercises]) {
+                    if (item.path === path) item.reading_minutes = minutes;
+                }
+            }
+            document.querySelectorAll('.nav-item').forEach(el => {
+                if (el.dataset.path !== path) return;
+                const tag = el.querySelector('.duration-tag');
+                if (tag) tag.textContent = `${minutes} 分钟`;
+                else el.querySelector('.truncate').insertAdjacentHTML('afterend', readingTag(minutes));
+            });
+        }
+        
+        // 统计接口不可用时从课程大纲推算；有条目尚未索引时不估算时长
+        function curriculumStats() {
+            const weeks = Object.values(curriculum);
+            const items = weeks.flatMap(w => [...w.tutorials, ...w.projects, ...w.exercises]);
+            const minutes = items.reduce((sum, item) => sum + (item.reading_minutes || 0), 0);
+            return {
+                weeks: weeks.length,
+                tutorials: weeks.reduce((sum, w) => sum + w.tutorials.length, 0),
+                projects: weeks.reduce((sum, w) => sum + w.projects.length, 0),
+                exercises: weeks.reduce((sum, w) => sum + w.exercises.length, 0),
+                estimated_hours: items.length && items.every(item => item.reading_minutes)
+                    ? Math.round(minutes / 6) / 10 : null
+            };
+        }
+        
         // 渲染导航
         function renderNav() {
             const container = document.getElementById('nav-container');
@@ -1476,6 +1961,7 @@ def get_enhanced_html_template():
                              data-path="${item.path}" onclick="event.stopPropagation(); loadContent('${item.path}')">
                             <span>${item.icon}</span>
                             <span class="flex-1 truncate">${item.name}</span>
+                            ${readingTag(item.reading_minutes)}
                         </div>
                     `;
                 }
@@ -1488,6 +1974,7 @@ def get_enhanced_html_template():
                              data-path="${item.path}" onclick="event.stopPropagation(); loadContent('${item.path}')">
                             <span>${item.icon}</span>
                             <span class="flex-1 truncate">${item.name}</span>
+                            ${readingTag(item.reading_minutes)}
                             <span class="text-xs bg-green-500/20 px-2 py-0.5 rounded">项目</span>
                         </div>
                     `;
@@ -1501,11 +1988,20 @@ def get_enhanced_html_template():
                              data-path="${item.path}" onclick="event.stopPropagation(); loadContent('${item.path}')">
                             <span>${item.icon}</span>
                             <span class="flex-1 truncate">${item.name}</span>
+                            ${readingTag(item.reading_minutes)}
                             <span class="text-xs bg-yellow-500/20 px-2 py-0.5 rounded">练习</span>
                         </div>
                     `;
                 }
                 
+                html += `
+                        <a href="/api/bundle/${weekId}" download onclick="event.stopPropagation()"
+                           class="nav-item glass-hover text-gray-400 text-xs">
+                            <span>📦</span>
+                            <span class="flex-1 truncate">下载本周离线包</span>
+                        </a>
+                    `;
+                
                 html += '</div></div></div>';
             }
             
@@ -1517,10 +2013,10 @@ def get_enhanced_html_template():
             const container = document.getElementById('content-container');
             
             // 获取统计数据
-            let stats = { weeks: 12, tutorials: 30, projects: 12, exercises: 6, estimated_hours: 150 };
+            let stats = curriculumStats();
             try {
                 const res = await fetch('/api/stats');
-                stats = await res.json();
+                if (res.ok) stats = await res.json();
             } catch (e) {}
             
             const completionRate = ProgressManager.getCompletionRate();
@@ -1557,7 +2053,7 @@ def get_enhanced_html_template():
                         </div>
                         <div class="stat-card group">
                             <div class="text-4xl mb-3 transform group-hover:scale-110 transition-transform">⏱️</div>
-                            <div class="text-3xl font-bold text-pink-400 mb-1">${stats.estimated_hours}h</div>
+                            <div class="text-3xl font-bold text-pink-400 mb-1">${stats.estimated_hours != null ? stats.estimated_hours + 'h' : '—'}</div>
                             <div class="text-gray-400 text-sm font-medium">预计时长</div>
                         </div>
                     </div>
@@ -1634,8 +2130,9 @@ def get_enhanced_html_template():
             });
             
             try {
-                const res = await fetch(`/api/content?path=${encodeURIComponent(path)}`);
-                const data = await res.json();
+                const data = await ContentSync.get(path);
+                const minutes = data.stats && data.stats.reading_minutes;
+                setReadingMinutes(path, minutes);
                 
                 if (data.type === 'python') {
                     const escaped = data.content
@@ -1647,6 +2144,7 @@ def get_enhanced_html_template():
                             <div class="flex items-center justify-between mb-4">
                                 <h2 class="text-xl font-bold text-gray-200">📄 ${path.split('/').pop()}</h2>
                                 <div class="flex items-center gap-3">
+                                    ${readingTag(minutes)}
                                     <span class="text-xs text-gray-500 bg-gray-700/50 px-2 py-1 rounded">Python</span>
                                     <button onclick="markAsCompleted('${path}')" class="text-xs bg-green-500/20 text-green-400 px-3 py-1 rounded hover:bg-green-500/30 transition">
                                         ✓ 标记完成
@@ -1660,7 +2158,8 @@ def get_enhanced_html_template():
                 } else {
                     container.innerHTML = `
                         <div class="glass rounded-xl p-8 markdown-body animate-slide-in">
-                            <div class="flex justify-end mb-4">
+                            <div class="flex items-center justify-between mb-4">
+                                <span>${readingTag(minutes)}</span>
                                 <button onclick="markAsCompleted('${path}')" class="text-sm bg-green-500/20 text-green-400 px-4 py-2 rounded-lg hover:bg-green-500/30 transition flex items-center gap-2">
                                     <span>✓</span> 标记完成
                                 </button>
@@ -1897,14 +2396,14 @@ def get_enhanced_html_template():
                     // 显示输出
                     let output = '';
                     if (stdout.length > 0) {
-                        output += stdout.join('\n');
+                        output += stdout.join('\\n');
                     }
                     if (result !== undefined && result !== null && result.toString() !== 'undefined') {
-                        if (output) output += '\n';
+                        if (output) output += '\\n';
                         output += '>>> ' + result.toString();
                     }
                     if (stderr.length > 0) {
-                        outputEl.innerHTML = `<pre class="error">${stderr.join('\n')}</pre>` + 
+                        outputEl.innerHTML = `<pre class="error">${stderr.join('\\n')}</pre>` + 
                             (output ? `<pre>${output}</pre>` : '');
                     } else if (output) {
                         outputEl.innerHTML = `<pre>${output}</pre>`;
@@ -1919,14 +2418,14 @@ def get_enhanced_html_template():
         
         // 代码模板库
         const CODE_TEMPLATES = [
-            { name: 'Hello World', icon: '👋', code: 'print("Hello, AI 工程师!")\nprint("欢迎来到 2026 训练营")' },
-            { name: '列表推导式', icon: '📝', code: '# 列表推导式\nsquares = [x**2 for x in range(10)]\nprint(f"平方数: {squares}")\n\n# 带条件\nevens = [x for x in range(20) if x % 2 == 0]\nprint(f"偶数: {evens}")' },
-            { name: '字典操作', icon: '📖', code: '# 字典推导式\nstudent = {"name": "小明", "age": 22, "课程": ["AI", "Python"]}\n\nfor key, value in student.items():\n    print(f"{key}: {value}")\n\n# 字典合并\nscores = {**student, "成绩": 95}\nprint(f"\n完整信息: {scores}")' },
-            { name: 'NumPy 基础', icon: '📊', code: 'import numpy as np\n\narr = np.array([1, 2, 3, 4, 5])\nprint(f"数组: {arr}")\nprint(f"均值: {arr.mean()}")\nprint(f"标准差: {arr.std():.2f}")\n\nmatrix = np.random.rand(3, 3)\nprint(f"\n随机矩阵:\n{matrix.round(2)}")' },
-            { name: '异步基础', icon: '⚡', code: 'import asyncio\n\nasync def greet(name, delay):\n    await asyncio.sleep(delay)\n    return f"Hello, {name}!"\n\nasync def main():\n    results = await asyncio.gather(\n        greet("AI", 0.1),\n        greet("Python", 0.2),\n        greet("世界", 0.15)\n    )\n    for r in results:\n        print(r)\n\nawait main()' },
-            { name: '数据处理', icon: '🔧', code: '# JSON 数据处理\nimport json\n\ndata = {\n    "users": [\n        {"name": "Alice", "score": 95},\n        {"name": "Bob", "score": 87},\n        {"name": "Charlie", "score": 92}\n    ]\n}\n\n# 排序和过滤\ntop = sorted(data["users"], key=lambda x: x["score"], reverse=True)\nprint("排名:")\nfor i, u in enumerate(top, 1):\n    print(f"  {i}. {u[\"name\"]} - {u[\"score\"]}分")' },
-            { name: '装饰器', icon: '🎭', code: 'import functools\nimport time\n\ndef timer(func):\n    @functools.wraps(func)\n    def wrapper(*args, **kwargs):\n        start = time.time()\n        result = func(*args, **kwargs)\n        elapsed = time.time() - start\n        print(f"{func.__name__} 耗时: {elapsed:.4f}s")\n        return result\n    return wrapper\n\n@timer\ndef compute():\n    return sum(i**2 for i in range(100000))\n\nresult = compute()\nprint(f"结果: {result}")' },
-            { name: '类与继承', icon: '🏛️', code: 'from dataclasses import dataclass\n\n@dataclass\nclass Agent:\n    name: str\n    role: str\n    skills: list\n    \n    def introduce(self):\n        return f"I am {self.name}, a {self.role}"\n\nclass AIAgent(Agent):\n    def think(self, task):\n        return f"{self.name} is analyzing: {task}"\n\nagent = AIAgent("Atlas", "Engineer", ["Python", "ML"])\nprint(agent.introduce())\nprint(agent.think("设计系统架构"))\nprint(f"技能: {\", \".join(agent.skills)}")' }
+            { name: 'Hello World', icon: '👋', code: 'print("Hello, AI 工程师!")\\nprint("欢迎来到 2026 训练营")' },
+            { name: '列表推导式', icon: '📝', code: '# 列表推导式\\nsquares = [x**2 for x in range(10)]\\nprint(f"平方数: {squares}")\\n\\n# 带条件\\nevens = [x for x in range(20) if x % 2 == 0]\\nprint(f"偶数: {evens}")' },
+            { name: '字典操作', icon: '📖', code: '# 字典推导式\\nstudent = {"name": "小明", "age": 22, "课程": ["AI", "Python"]}\\n\\nfor key, value in student.items():\\n    print(f"{key}: {value}")\\n\\n# 字典合并\\nscores = {**student, "成绩": 95}\\nprint(f"\\n完整信息: {scores}")' },
+            { name: 'NumPy 基础', icon: '📊', code: 'import numpy as np\\n\\narr = np.array([1, 2, 3, 4, 5])\\nprint(f"数组: {arr}")\\nprint(f"均值: {arr.mean()}")\\nprint(f"标准差: {arr.std():.2f}")\\n\\nmatrix = np.random.rand(3, 3)\\nprint(f"\\n随机矩阵:\\n{matrix.round(2)}")' },
+            { name: '异步基础', icon: '⚡', code: 'import asyncio\\n\\nasync def greet(name, delay):\\n    await asyncio.sleep(delay)\\n    return f"Hello, {name}!"\\n\\nasync def main():\\n    results = await asyncio.gather(\\n        greet("AI", 0.1),\\n        greet("Python", 0.2),\\n        greet("世界", 0.15)\\n    )\\n    for r in results:\\n        print(r)\\n\\nawait main()' },
+            { name: '数据处理', icon: '🔧', code: '# JSON 数据处理\\nimport json\\n\\ndata = {\\n    "users": [\\n        {"name": "Alice", "score": 95},\\n        {"name": "Bob", "score": 87},\\n        {"name": "Charlie", "score": 92}\\n    ]\\n}\\n\\n# 排序和过滤\\ntop = sorted(data["users"], key=lambda x: x["score"], reverse=True)\\nprint("排名:")\\nfor i, u in enumerate(top, 1):\\n    print(f"  {i}. {u[\"name\"]} - {u[\"score\"]}分")' },
+            { name: '装饰器', icon: '🎭', code: 'import functools\\nimport time\\n\\ndef timer(func):\\n    @functools.wraps(func)\\n    def wrapper(*args, **kwargs):\\n        start = time.time()\\n        result = func(*args, **kwargs)\\n        elapsed = time.time() - start\\n        print(f"{func.__name__} 耗时: {elapsed:.4f}s")\\n        return result\\n    return wrapper\\n\\n@timer\\ndef compute():\\n    return sum(i**2 for i in range(100000))\\n\\nresult = compute()\\nprint(f"结果: {result}")' },
+            { name: '类与继承', icon: '🏛️', code: 'from dataclasses import dataclass\\n\\n@dataclass\\nclass Agent:\\n    name: str\\n    role: str\\n    skills: list\\n    \\n    def introduce(self):\\n        return f"I am {self.name}, a {self.role}"\\n\\nclass AIAgent(Agent):\\n    def think(self, task):\\n        return f"{self.name} is analyzing: {task}"\\n\\nagent = AIAgent("Atlas", "Engineer", ["Python", "ML"])\\nprint(agent.introduce())\\nprint(agent.think("设计系统架构"))\\nprint(f"技能: {\", \".join(agent.skills)}")' }
         ];
         
         // 渲染 Playground 页面
@@ -2070,9 +2569,33 @@ def get_enhanced_html_template():
             const container = document.getElementById('content-container');
             if (container) {
                 enhanceCodeBlocks(container);
+                renderRelated(path, container);
+                ContentSync.prefetchNext(path);
             }
         };
         
+        // 相关教程推荐（服务端预计算的近邻表）
+        async function renderRelated(path, container) {
+            try {
+                const res = await fetch(`/api/related/${path}`);
+                if (!res.ok || currentPath !== path) return;
+                const data = await res.json();
+                if (!data.related.length) return;
+                const items = data.related.map(r => `
+                    <button onclick="loadContent('${r.id}')" class="text-left px-4 py-3 rounded-lg bg-white/5 hover:bg-purple-500/10 transition text-sm text-gray-200">
+                        ${r.icon || '📄'} ${r.name || r.id}
+                        <span class="text-xs text-gray-500 ml-2">${r.week || ''}</span>
+                    </button>
+                `).join('');
+                container.insertAdjacentHTML('beforeend', `
+                    <div class="glass rounded-xl p-6 mt-6 animate-slide-in">
+                        <h3 class="text-sm font-semibold text-gray-300 mb-3">🔗 相关教程</h3>
+                        <div class="grid gap-2">${items}</div>
+                    </div>
+                `);
+            } catch (e) {}
+        }
+        
         // 启动应用
         init();
     </script>
@@ -2080,6 +2603,114 @@ def get_enhanced_html_template():
 </html>'''
 
 
+def get_service_worker_js():
+    """
+    Service Worker：
+    - 应用外壳与小型API：缓存优先 + 后台重新验证（stale-while-revalidate）
+    - 课程内容：URL 带版本哈希（?v=），命中即不可变，直接缓存优先
+    - 页面空闲时发送 prefetch 消息，预取本周接下来的内容
+    - 外壳缓存名带主页的版本哈希（与 /api/manifest 的 shell 相同）：主页变化时 sw.js 随之变化，
+      浏览器安装新的 Service Worker，激活时删除旧版本的外壳缓存
+    """
+    return '''const SHELL_CACHE = 'bootcamp-shell-__SHELL_VERSION__';
+const CONTENT_CACHE = 'bootcamp-content-v1';
+const SHELL_URLS = ['/', '/api/curriculum', '/api/manifest', '/api/stats'];
+const NETWORK_ONLY = ['/api/content/events', '/api/agents/', '/api/content/delta', '/api/bundle/', '/api/ready', '/metrics', '/debug/', '/sw.js'];
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(caches.open(SHELL_CACHE).then(cache => cache.addAll(SHELL_URLS)));
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', (event) => {
+    const keep = [SHELL_CACHE, CONTENT_CACHE];
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(k => !keep.includes(k)).map(k => caches.delete(k))))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function staleWhileRevalidate(event, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(event.request);
+    const network = fetch(event.request).then(res => {
+        if (res.ok || res.type === 'opaque') cache.put(event.request, res.clone());
+        return res;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => null));
+        return cached;
+    }
+    return network;
+}
+
+async function cacheFirst(request) {
+    const cache = await caches.open(CONTENT_CACHE);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const res = await fetch(request);
+    if (res.ok) cache.put(request, res.clone());
+    return res;
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+
+    if (url.origin !== self.location.origin) {
+        // CDN 上的样式/脚本/字体（不包括体积很大的 Pyodide）
+        if (['script', 'style', 'font'].includes(request.destination) && !url.pathname.includes('/pyodide/')) {
+            event.respondWith(staleWhileRevalidate(event, SHELL_CACHE));
+        }
+        return;
+    }
+    if (NETWORK_ONLY.some(prefix => url.pathname.startsWith(prefix))) return;
+
+    if (url.pathname === '/api/content' && url.searchParams.has('v')) {
+        event.respondWith(cacheFirst(request));
+    } else {
+        event.respondWith(staleWhileRevalidate(event, SHELL_CACHE));
+    }
+});
+
+self.addEventListener('message', (event) => {
+    const data = event.data || {};
+    if (data.type === 'prefetch') {
+        event.waitUntil(prefetch(data.urls || []));
+    } else if (data.type === 'manifest') {
+        event.waitUntil(evictStale(data.content || {}));
+    }
+});
+
+async function prefetch(urls) {
+    const cache = await caches.open(CONTENT_CACHE);
+    for (const url of urls) {
+        if (await cache.match(url)) continue;
+        try {
+            const res = await fetch(url);
+            if (res.ok) await cache.put(url, res);
+        } catch (e) {
+            return;
+        }
+    }
+}
+
+async function evictStale(versions) {
+    // 删除版本哈希已不是最新的内容缓存
+    const cache = await caches.open(CONTENT_CACHE);
+    for (const request of await cache.keys()) {
+        const url = new URL(request.url);
+        const path = url.searchParams.get('path');
+        if (path in versions && versions[path] !== url.searchParams.get('v')) {
+            await cache.delete(request);
+        }
+    }
+}
+'''.replace('__SHELL_VERSION__', content_hash(get_home_page()))
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080)
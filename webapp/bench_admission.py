@@ -0,0 +1,62 @@
+"""
+🚦 过载保护检查
+================
+
+在进程内向 /api/content 同时发出一批请求（不经过网络），确认：
+- 在途请求数超过 max_in_flight 时，多出的请求快速得到 503 + Retry-After
+- 全部请求结束后在途计数回到 0
+
+为了只测全局上限，检查期间把每客户端令牌桶放宽到不会触发。
+
+运行方式：
+    python -m webapp.bench_admission --requests 300 --max-in-flight 8
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+import webapp.app as web
+
+
+async def flood(requests: int, max_in_flight: int) -> Counter:
+    admission = web.admission
+    admission.max_in_flight = max_in_flight
+    admission.rate = admission.burst = float("inf")
+    async with web.lifespan(web.app):
+        while not web.warmup_state["ready"]:
+            await asyncio.sleep(0.05)
+        path = web.CURRICULUM["week1"]["tutorials"][0]["path"]
+        transport = httpx.ASGITransport(app=web.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.get("/api/content", params={"path": path}) for _ in range(requests)
+            ))
+            elapsed = time.perf_counter() - started
+    statuses = Counter(r.status_code for r in responses)
+    print(f"📊 {requests} 个并发请求, max_in_flight={max_in_flight}, 耗时 {elapsed:.3f}s")
+    print(f"  状态码:   {dict(statuses)}")
+    print(f"  计数:     {admission.counts}")
+    print(f"  结束后在途: {admission.in_flight}")
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="过载保护检查")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    args = parser.parse_args()
+    statuses = asyncio.run(flood(args.requests, args.max_in_flight))
+    if args.requests > args.max_in_flight and not statuses.get(503):
+        raise SystemExit("❌ 并发请求超过上限却没有任何 503，过载保护未生效")
+    if web.admission.in_flight:
+        raise SystemExit("❌ 请求结束后在途计数未归零")
+    print("✅ 过载保护生效")
+
+
+if __name__ == "__main__":
+    main()
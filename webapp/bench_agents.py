@@ -0,0 +1,79 @@
+"""
+⏱️ Agent协调器吞吐基准测试
+===========================
+
+用固定的任务集运行 execute_batch_with_reflection，所有模型请求经过卡带：
+- 先在有 API Key 的环境录制一次
+- 之后离线回放，可按录制时的延迟模拟耗时（--latency-scale），结果可重复
+
+研究结果缓存与卡带放在一起，保证回放时发出的请求与录制时逐字节相同。
+
+运行方式：
+    python -m webapp.bench_agents --record cassettes/agents.jsonl
+    python -m webapp.bench_agents --replay cassettes/agents.jsonl --latency-scale 1 --repeat 3
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+from webapp.agents import AgentRole, EnhancedOrchestrator
+from webapp.cassette import Cassette
+from webapp.llm_pool import LLMClientPool
+from webapp.research_cache import ResearchCache
+
+
+TASKS = [
+    ("为图书管理API设计分页与过滤参数", AgentRole.ENGINEER),
+    ("编写异步编程入门教程的大纲", AgentRole.CONTENT),
+    ("审查一段使用 asyncio.gather 的代码", AgentRole.REVIEWER),
+    ("规划RAG问答系统的实现步骤", AgentRole.PLANNER),
+    ("设计学习进度仪表板的交互", AgentRole.DESIGNER),
+    ("实现带重试的DeepSeek调用封装", AgentRole.ENGINEER),
+]
+
+
+async def run_once(cassette: Cassette, research_path: Path, queue_size: int) -> dict:
+    orchestrator = EnhancedOrchestrator(
+        research_cache=ResearchCache(research_path, ttl_seconds=float("inf")),
+        llm=LLMClientPool(cassette=cassette),
+    )
+    started = time.perf_counter()
+    await orchestrator.execute_batch_with_reflection(TASKS, queue_size=queue_size)
+    wall_clock = time.perf_counter() - started
+    if cassette.stats["misses"]:
+        raise SystemExit(f"卡带回放有 {cassette.stats['misses']} 次未命中，结果不可用于比较")
+    calls = sum(stats["calls"] for stats in orchestrator.llm.report().values())
+    return {"wall_clock_s": wall_clock, "calls": calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent协调器吞吐基准测试（卡带录制/回放）")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--record", type=Path, metavar="CASSETTE")
+    mode.add_argument("--replay", type=Path, metavar="CASSETTE")
+    parser.add_argument("--latency-scale", type=float, default=0.0,
+                        help="回放时模拟录制延迟的倍数，0 表示不等待")
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    path = args.record or args.replay
+    research_path = path.with_suffix(".research.sqlite3")
+    runs = []
+    for _ in range(1 if args.record else args.repeat):
+        cassette = Cassette(path, "record" if args.record else "replay", args.latency_scale)
+        runs.append(asyncio.run(run_once(cassette, research_path, args.queue_size)))
+
+    walls = [r["wall_clock_s"] for r in runs]
+    median = statistics.median(walls)
+    print(f"\n📊 {len(TASKS)} 个任务 × {len(runs)} 次")
+    print(f"  模型调用:   {runs[-1]['calls']} 次/轮 ({cassette.stats})")
+    print(f"  墙钟中位数: {median:.3f}s")
+    print(f"  吞吐:       {len(TASKS) / median:.2f} 任务/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+⏱️ Agent消息基准测试
+=====================
+
+对比旧版消息表示（普通 dataclass + ISO 时间字符串）与当前 AgentMessage：
+- construct_ns:  每条消息的构造耗时
+- bytes/msg:     每条消息的内存占用（tracemalloc 统计，含内容以外的全部分配）
+- encode/decode: 二进制编解码与紧凑JSON编解码的耗时和字节数，pickle 作为参照
+
+运行方式：
+    python -m webapp.bench_messages --count 100000
+"""
+
+import argparse
+import pickle
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable
+
+from webapp.agents import (
+    AgentMessage, AgentRole, decode_message, encode_message,
+    message_from_json, message_to_json,
+)
+
+
+@dataclass
+class LegacyAgentMessage:
+    """改造前的消息表示，仅用于对比"""
+    from_agent: AgentRole
+    to_agent: AgentRole
+    content: Any
+    message_type: str
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+
+
+def _per_item_ns(fn: Callable[[int], Any], count: int) -> float:
+    started = time.perf_counter_ns()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter_ns() - started) / count
+
+
+def _bytes_per_item(factory: Callable[[int], Any], count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # 减去列表本身的指针开销
+    return (after - before) / count - 8 if items else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent消息构造与序列化基准测试")
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+    count = args.count
+    roles = list(AgentRole)
+    content = "实现用户登录接口"
+
+    def legacy(i: int):
+        return LegacyAgentMessage(roles[i % 8], roles[(i + 1) % 8], content, "request")
+
+    def current(i: int):
+        return AgentMessage(roles[i % 8], roles[(i + 1) % 8], content, "request")
+
+    print(f"📨 {count} 条消息\n")
+    print("构造")
+    for name, factory in (("legacy", legacy), ("slots", current)):
+        print(f"  {name:<8} {_per_item_ns(factory, count):8.0f} ns/msg "
+              f"{_bytes_per_item(factory, count):8.0f} bytes/msg")
+
+    message = AgentMessage(AgentRole.COMMANDER, AgentRole.ENGINEER,
+                           {"task": content, "context": {"week": 3}}, "request",
+                           correlation_id="0f" * 16)
+    codecs = (
+        ("binary", encode_message, decode_message),
+        ("json", message_to_json, message_from_json),
+        ("pickle", pickle.dumps, pickle.loads),
+    )
+    print("\n序列化（dict 内容 + correlation_id）")
+    for name, encode, decode in codecs:
+        payload = encode(message)
+        assert decode(payload) == message, name
+        encode_ns = _per_item_ns(lambda _: encode(message), count)
+        decode_ns = _per_item_ns(lambda _: decode(payload), count)
+        size = len(payload.encode("utf-8") if isinstance(payload, str) else payload)
+        print(f"  {name:<8} encode {encode_ns:6.0f} ns  decode {decode_ns:6.0f} ns  {size:4d} bytes")
+
+
+if __name__ == "__main__":
+    main()
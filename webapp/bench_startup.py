@@ -0,0 +1,103 @@
+"""
+⏱️ 冷启动基准测试
+==================
+
+模拟 Render 免费实例休眠后的冷启动，测量：
+- import_ms:       在全新解释器中导入 webapp.app 的耗时
+- first_200_ms:    从启动 uvicorn 进程到主页首次返回200的耗时
+- ready_ms:        从启动到 /api/ready 返回200（预热完成）的耗时
+
+运行方式：
+    python -m webapp.bench_startup --runs 5
+"""
+
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).parent.parent
+
+
+def measure_import() -> float:
+    """在子进程中测量导入耗时（避免复用已加载的模块）"""
+    code = (
+        "import time; t = time.perf_counter(); import webapp.app; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=BASE_DIR,
+        capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, started: float, timeout: float) -> float:
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as res:
+                if res.status == 200:
+                    return (time.perf_counter() - started) * 1000
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} 在 {timeout}s 内未就绪")
+
+
+def measure_server(timeout: float = 30.0) -> dict:
+    """启动 uvicorn 并测量首个200与预热完成时间"""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "webapp.app:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        first_200 = _wait_for(base + "/", started, timeout)
+        ready = _wait_for(base + "/api/ready", started, timeout)
+        with urllib.request.urlopen(base + "/api/ready") as res:
+            warmup = json.loads(res.read())
+        return {"first_200_ms": first_200, "ready_ms": ready, "warmup": warmup}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="webapp 冷启动基准测试")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, first, ready = [], [], []
+    for i in range(args.runs):
+        imports.append(measure_import())
+        result = measure_server()
+        first.append(result["first_200_ms"])
+        ready.append(result["ready_ms"])
+        print(f"  run {i + 1}: import={imports[-1]:.0f}ms "
+              f"first_200={first[-1]:.0f}ms ready={ready[-1]:.0f}ms "
+              f"steps={result['warmup']['steps']}")
+
+    print("\n📊 中位数")
+    print(f"  import_ms:    {statistics.median(imports):.0f}")
+    print(f"  first_200_ms: {statistics.median(first):.0f}")
+    print(f"  ready_ms:     {statistics.median(ready):.0f}")
+
+
+if __name__ == "__main__":
+    main()
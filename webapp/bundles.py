@@ -0,0 +1,164 @@
+"""
+📦 每周离线下载包
+==================
+
+把某一周在 CURRICULUM 中列出的全部文件打包为 zip：
+- 缓存键 = 成员文件 (内容ID, 版本哈希) 的哈希，任一文件变化才会重新生成
+- 包只构建一次并缓存在磁盘上；新包生成后保留上一版（可能仍有下载在读取），更早的版本删除
+- 响应打开文件后按文件句柄读取，之后文件被删除也不影响正在进行的下载
+- 支持 HTTP Range（断点续传），ETag 即缓存键
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from webapp.content_index import ContentEntry
+
+
+BUNDLE_CACHE_DIR = Path(
+    os.getenv("BUNDLE_CACHE_DIR", Path(tempfile.gettempdir()) / "ai-bootcamp-bundles")
+)
+CHUNK_SIZE = 64 * 1024
+
+# 固定zip内的时间戳，保证相同内容生成字节完全相同的包
+_ZIP_DATE = (2026, 1, 1, 0, 0, 0)
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def bundle_key(entries: list[ContentEntry]) -> str:
+    digest = hashlib.sha256()
+    for entry in sorted(entries, key=lambda e: e.content_id):
+        digest.update(f"{entry.content_id}:{entry.hash}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class BundleCache:
+    """按周缓存 zip 包；同一周的并发请求只构建一次"""
+
+    def __init__(self, cache_dir: Path = BUNDLE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.locks: dict[str, asyncio.Lock] = {}
+
+    def _build(self, week_id: str, key: str, entries: list[ContentEntry]) -> Path:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        target = self.cache_dir / f"{week_id}-{key}.zip"
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+                for entry in entries:
+                    info = zipfile.ZipInfo(entry.content_id, date_time=_ZIP_DATE)
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    zf.writestr(info, entry.text.encode("utf-8"))
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        # 保留最近的一个旧包：刚拿到它路径、还没打开文件的请求仍能读到
+        stale = sorted(
+            (p for p in self.cache_dir.glob(f"{week_id}-*.zip") if p != target),
+            key=lambda p: p.stat().st_mtime, reverse=True
+        )
+        for old in stale[1:]:
+            try:
+                old.unlink(missing_ok=True)
+            except OSError:
+                # Windows 上正在被读取的文件无法删除，留到下次构建
+                pass
+        return target
+
+    async def get(self, week_id: str, entries: list[ContentEntry]) -> tuple[Path, str]:
+        """返回 (zip路径, 缓存键)，仅在成员文件变化时重新生成"""
+        key = bundle_key(entries)
+        target = self.cache_dir / f"{week_id}-{key}.zip"
+        if target.exists():
+            return target, key
+        lock = self.locks.setdefault(week_id, asyncio.Lock())
+        async with lock:
+            if not target.exists():
+                await asyncio.to_thread(self._build, week_id, key, entries)
+        return target, key
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """解析单段 Range 头；返回闭区间 (start, end)，无法满足时抛 ValueError"""
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        # 多段或格式不支持：按规范可以忽略 Range 返回完整内容
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def _iter_file(f: BinaryIO, start: int, length: int) -> Iterator[bytes]:
+    """从已打开的文件读取指定区间，读完或客户端断开时关闭文件"""
+    with f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def range_file_response(request: Request, path: Path, etag: str,
+                        media_type: str, filename: str) -> Response:
+    """
+    支持 Range / If-Range 的文件响应
+
+    文件在这里就被打开，之后被删除或替换也不影响本次响应；文件已不存在时抛 FileNotFoundError
+    """
+    f = open(path, "rb")
+    size = os.fstat(f.fileno()).st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        f.close()
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != headers["ETag"]:
+        range_header = None
+    try:
+        byte_range = _parse_range(range_header, size)
+    except ValueError:
+        f.close()
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _iter_file(f, start, length), status_code=status,
+        media_type=media_type, headers=headers
+    )
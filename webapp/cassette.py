@@ -0,0 +1,127 @@
+"""
+📼 LLM请求录制/回放
+====================
+
+- record: 照常调用模型，同时把每次请求与响应（含流式分段及其时间）追加到 JSONL 卡带文件
+- replay: 不联网，按请求内容匹配卡带中的响应返回；可按录制时的延迟（乘以 latency_scale）模拟耗时
+
+匹配键 = (model, messages, temperature, max_tokens, 是否流式) 的哈希；
+相同请求出现多次时按录制顺序依次返回，用完后循环。
+
+使用方式：
+    pool = LLMClientPool(cassette=Cassette("cassettes/agents.jsonl", mode="record"))
+    pool = LLMClientPool(cassette=Cassette("cassettes/agents.jsonl", mode="replay", latency_scale=1.0))
+
+也可以通过环境变量让默认客户端池使用卡带：
+    LLM_CASSETTE=cassettes/agents.jsonl LLM_CASSETTE_MODE=replay python -m webapp.agents
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Literal
+
+
+CassetteMode = Literal["record", "replay"]
+
+
+class CassetteMissError(KeyError):
+    """回放时卡带中没有匹配的请求"""
+
+
+def request_key(request: dict, stream: bool) -> str:
+    material = json.dumps({
+        "model": request.get("model"),
+        "messages": request.get("messages"),
+        "temperature": request.get("temperature"),
+        "max_tokens": request.get("max_tokens"),
+        "stream": stream,
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:24]
+
+
+class Cassette:
+    """JSONL卡带：每行一次交互"""
+
+    def __init__(self, path: Path, mode: CassetteMode = "replay", latency_scale: float = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"未知的卡带模式: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions: dict[str, list[dict]] = defaultdict(list)
+        self._cursor: dict[str, int] = defaultdict(int)
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        if mode == "replay":
+            self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"卡带不存在: {self.path}")
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    self.interactions[item["key"]].append(item)
+
+    def _append(self, item: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 每次交互立即落盘，录制中途中断也不丢已完成的部分
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self.interactions[item["key"]].append(item)
+        self.stats["recorded"] += 1
+
+    def _next(self, key: str, request: dict) -> dict:
+        recorded = self.interactions.get(key)
+        if not recorded:
+            self.stats["misses"] += 1
+            raise CassetteMissError(
+                f"卡带 {self.path.name} 中没有匹配的请求 (model={request.get('model')}, key={key})"
+            )
+        index = self._cursor[key]
+        self._cursor[key] = index + 1
+        self.stats["replayed"] += 1
+        return recorded[index % len(recorded)]
+
+    async def create(self, request: dict, call: Callable[[], Awaitable[dict]]) -> dict:
+        """包装一次非流式调用：录制模式执行 call 并保存，回放模式直接返回录制结果"""
+        key = request_key(request, stream=False)
+        if self.mode == "replay":
+            item = self._next(key, request)
+            if self.latency_scale:
+                await asyncio.sleep(item["latency_s"] * self.latency_scale)
+            return item["response"]
+        started = time.perf_counter()
+        response = await call()
+        self._append({
+            "key": key, "request": request, "response": response,
+            "latency_s": round(time.perf_counter() - started, 4),
+        })
+        return response
+
+    async def stream(self, request: dict,
+                     call: Callable[[], AsyncIterator[dict]]) -> AsyncIterator[dict]:
+        """包装一次流式调用；回放时按录制的分段时间间隔产出"""
+        key = request_key(request, stream=True)
+        if self.mode == "replay":
+            item = self._next(key, request)
+            previous = 0.0
+            for offset, chunk in item["chunks"]:
+                if self.latency_scale:
+                    await asyncio.sleep((offset - previous) * self.latency_scale)
+                previous = offset
+                yield chunk
+            return
+        started = time.perf_counter()
+        chunks = []
+        async for chunk in call():
+            chunks.append([round(time.perf_counter() - started, 4), chunk])
+            yield chunk
+        self._append({
+            "key": key, "request": request, "stream": True, "chunks": chunks,
+            "latency_s": round(time.perf_counter() - started, 4),
+        })
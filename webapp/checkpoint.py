@@ -0,0 +1,113 @@
+"""
+💾 协调器运行检查点
+====================
+
+长时间运行的流水线每完成一步就写入SQLite（键为 run_id + step）：
+- 步骤结果与执行该步骤的 AgentState 一起保存
+- 以同一个 run_id 重新运行时，已完成的步骤直接读取结果，不再调用模型
+- 进程崩溃只损失正在执行的步骤
+
+使用方式：
+    store = CheckpointStore()
+    orchestrator = EnhancedOrchestrator(checkpoints=store)
+    await orchestrator.run_content_improvement_pipeline([1, 2, 3])              # 打印 run_id
+    await orchestrator.run_content_improvement_pipeline([1, 2, 3], run_id=...)  # 崩溃后续跑
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Optional
+
+
+DEFAULT_CHECKPOINT_PATH = Path(os.getenv(
+    "CHECKPOINT_PATH",
+    Path(__file__).parent.parent / ".cache" / "checkpoints.sqlite3"
+))
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class CheckpointStore:
+    """基于SQLite的步骤级检查点"""
+
+    def __init__(self, path: Path = DEFAULT_CHECKPOINT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn, conn:
+            # WAL：并发的步骤写入互不阻塞读取
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS steps (
+                    run_id TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    agent_state TEXT,
+                    completed_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, step)
+                )
+            """)
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=5))
+
+    def start_run(self, run_id: str, kind: str, params: dict):
+        """登记运行（已存在时保留原始参数）"""
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?)",
+                (run_id, kind, json.dumps(params, ensure_ascii=False), time.time())
+            )
+
+    def completed(self, run_id: str) -> dict[str, dict]:
+        """该运行已完成的步骤：step -> {"result": ..., "agent_state": ...}"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT step, result, agent_state FROM steps WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        return {
+            step: {"result": json.loads(result), "agent_state": json.loads(state) if state else None}
+            for step, result, state in rows
+        }
+
+    def save(self, run_id: str, step: str, result: Any, agent_state: Optional[dict] = None):
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?)",
+                (run_id, step, json.dumps(result, ensure_ascii=False, default=str),
+                 json.dumps(agent_state, ensure_ascii=False, default=str) if agent_state else None,
+                 time.time())
+            )
+
+    def runs(self, limit: int = 20) -> list[dict]:
+        """最近的运行及其完成步骤数"""
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT r.run_id, r.kind, r.params, r.created_at, COUNT(s.step)
+                FROM runs r LEFT JOIN steps s ON s.run_id = r.run_id
+                GROUP BY r.run_id ORDER BY r.created_at DESC LIMIT ?
+            """, (limit,)).fetchall()
+        return [
+            {"run_id": run_id, "kind": kind, "params": json.loads(params),
+             "created_at": created_at, "completed_steps": steps}
+            for run_id, kind, params, created_at, steps in rows
+        ]
+
+    def delete(self, run_id: str):
+        with self._connect() as conn, conn:
+            conn.execute("DELETE FROM steps WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
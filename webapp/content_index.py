@@ -0,0 +1,245 @@
+"""
+📦 课程内容索引
+================
+
+为 CURRICULUM 中列出的每个文件维护：
+- 内容ID（即相对路径，与前端 /api/content?path= 保持一致）
+- 版本哈希（内容的 sha256 前16位）
+- 最近若干版本的文本，用于计算行级增量（delta）
+- 阅读统计（字数、代码块数、预计阅读时间），与版本哈希一同在建索引时一次算出
+
+配合 ChangeFeed 通过 SSE 向已打开页面的学习者推送“内容已更新”事件，
+客户端只需拉取与其当前版本之间的差异，而不是整份文件。
+"""
+
+import asyncio
+import difflib
+import hashlib
+import math
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+
+# 每个文件保留的历史版本数（超出后客户端退化为全量拉取）
+MAX_VERSIONS = 8
+
+CONTENT_KINDS = ("tutorials", "projects", "exercises")
+
+# 阅读速度：中文字符、英文单词、代码行（代码需要逐行理解，明显更慢）
+CJK_CHARS_PER_MINUTE = 300
+WORDS_PER_MINUTE = 200
+CODE_LINES_PER_MINUTE = 20
+
+_CJK_RE = re.compile(r"[一-鿿]")
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+
+def content_hash(data: bytes) -> str:
+    """计算内容版本哈希"""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def split_lines(text: str) -> list[str]:
+    """按 \\n 切分并保留行尾，与前端 ContentSync.splitLines 语义一致"""
+    parts = text.split("\n")
+    lines = [p + "\n" for p in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def make_delta(old: str, new: str) -> list[list]:
+    """
+    计算行级增量
+
+    Returns:
+        list: [[起始行, 结束行, 替换文本], ...]，行号基于旧版本，
+              客户端按倒序应用即可得到新版本
+    """
+    a, b = split_lines(old), split_lines(new)
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    return [
+        [i1, i2, "".join(b[j1:j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def compute_stats(text: str, is_code: bool = False) -> dict:
+    """
+    单次遍历统计字数、代码块与预计阅读时间
+
+    Markdown 中围栏代码块内的行按代码计；.py 文件的非空行全部按代码计。
+    """
+    prose, code_lines, code_blocks = [], 0, 0
+    in_fence = False
+    for line in text.split("\n"):
+        if not is_code and _FENCE_RE.match(line):
+            in_fence = not in_fence
+            code_blocks += in_fence
+            continue
+        if is_code or in_fence:
+            code_lines += bool(line.strip())
+        else:
+            prose.append(line)
+    prose_text = "\n".join(prose)
+    cjk_chars = len(_CJK_RE.findall(prose_text))
+    words = len(_WORD_RE.findall(prose_text))
+    minutes = (
+        cjk_chars / CJK_CHARS_PER_MINUTE
+        + words / WORDS_PER_MINUTE
+        + code_lines / CODE_LINES_PER_MINUTE
+    )
+    return {
+        "chars": len(text),
+        "words": cjk_chars + words,
+        "code_blocks": code_blocks,
+        "code_lines": code_lines,
+        "reading_minutes": max(1, math.ceil(minutes)),
+    }
+
+
+@dataclass
+class ContentEntry:
+    """单个课程文件的索引项"""
+    content_id: str
+    path: Path
+    kind: str
+    week: str
+    hash: str = ""
+    mtime_ns: int = 0
+    size: int = 0
+    versions: OrderedDict = field(default_factory=OrderedDict)
+    stats: dict = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        return self.versions.get(self.hash, "")
+
+    def to_dict(self) -> dict:
+        return {"id": self.content_id, "hash": self.hash, "size": self.size}
+
+
+class ContentIndex:
+    """课程内容索引：按需重新哈希发生变化的文件"""
+
+    def __init__(self, base_dir: Path, curriculum: dict):
+        self.base_dir = base_dir
+        self.entries: dict[str, ContentEntry] = {}
+        self.version = 0
+        # 最近一次扫描时读取失败的文件：内容ID → 错误信息
+        self.errors: dict[str, str] = {}
+        for week_id, week in curriculum.items():
+            for kind in CONTENT_KINDS:
+                for item in week.get(kind, []):
+                    self.entries[item["path"]] = ContentEntry(
+                        content_id=item["path"],
+                        path=base_dir / item["path"],
+                        kind=kind,
+                        week=week_id,
+                    )
+
+    def get(self, content_id: str) -> Optional[ContentEntry]:
+        return self.entries.get(content_id)
+
+    def refresh(self) -> list[ContentEntry]:
+        """
+        扫描所有文件，只重新读取 mtime/size 变化的文件，返回内容确实变化的项
+
+        单个文件读取或解码失败（例如编辑器保存到一半）时跳过该文件并记入 errors，
+        不记录其 mtime/size，下次扫描会重试
+        """
+        changed = []
+        for entry in self.entries.values():
+            try:
+                stat = entry.path.stat()
+                if stat.st_mtime_ns == entry.mtime_ns and stat.st_size == entry.size:
+                    continue
+                data = entry.path.read_bytes()
+                text = data.decode("utf-8")
+            except FileNotFoundError:
+                # stat 与读取之间文件被删除或替换
+                continue
+            except (OSError, UnicodeDecodeError) as e:
+                if self.errors.get(entry.content_id) != str(e):
+                    print(f"⚠️ 内容索引跳过 {entry.content_id}: {type(e).__name__}: {e}")
+                self.errors[entry.content_id] = str(e)
+                continue
+            self.errors.pop(entry.content_id, None)
+            entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+            new_hash = content_hash(data)
+            if new_hash == entry.hash:
+                continue
+            # 先写入文本和统计再切换哈希，避免并发读取到不完整的版本
+            entry.versions[new_hash] = text
+            entry.versions.move_to_end(new_hash)
+            entry.stats = compute_stats(text, is_code=entry.content_id.endswith(".py"))
+            entry.hash = new_hash
+            while len(entry.versions) > MAX_VERSIONS:
+                entry.versions.popitem(last=False)
+            changed.append(entry)
+        if changed:
+            self.version += 1
+        return changed
+
+    def snapshot(self) -> dict:
+        """当前所有内容的版本哈希"""
+        return {cid: e.hash for cid, e in self.entries.items() if e.hash}
+
+    def delta(self, content_id: str, since: str) -> Optional[dict]:
+        """计算从 since 版本到当前版本的增量；未知版本时返回全量内容"""
+        entry = self.get(content_id)
+        if entry is None or not entry.hash:
+            return None
+        result = {"id": content_id, "base": since, "hash": entry.hash, "stats": entry.stats}
+        if since == entry.hash:
+            result["ops"] = []
+        elif since in entry.versions:
+            result["ops"] = make_delta(entry.versions[since], entry.text)
+        else:
+            result["full"] = True
+            result["content"] = entry.text
+        return result
+
+
+class ChangeFeed:
+    """内容变更广播：每个 SSE 连接一个有界队列，慢消费者的积压事件会被合并为一次重新同步"""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.subscribers: set[asyncio.Queue] = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.maxsize)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # 慢消费者：丢弃积压事件，改为让其重新拉取一次版本快照
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"resync": True})
+
+
+async def watch_content(index: ContentIndex, feed: ChangeFeed, interval: float = 5.0):
+    """后台轮询文件变化并广播；单次扫描出错只记录，不结束轮询"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            changed = await asyncio.to_thread(index.refresh)
+        except Exception as e:
+            print(f"⚠️ 内容轮询出错，{interval}s 后重试: {type(e).__name__}: {e}")
+            continue
+        for entry in changed:
+            feed.publish(entry.to_dict())
@@ -0,0 +1,92 @@
+"""
+🧾 有界历史记录
+================
+
+Agent 的 history、AgentState.messages 与协调器的 execution_history 共用的容器：
+- 内存中只保留最近 maxlen 条（环形缓冲）
+- 更早的条目按批追加到 gzip 压缩的 JSONL 文件（每批一个 gzip 成员）
+- 迭代时先读磁盘再读内存，调用方无需关心条目在哪里
+
+没有指定 spill_path 时只保留最近的条目，溢出的条目计入 dropped。
+落盘的条目经过 JSON 序列化，枚举、datetime 等会变成字符串。
+
+使用方式：
+    history = SpillingHistory(maxlen=200, spill_path=Path(".cache/agent_history/run.jsonl.gz"))
+    history.append({"type": "action", "task": "..."})
+    for entry in history:      # 全部条目，从旧到新
+        ...
+    history.recent(10)         # 最近10条（仅内存）
+"""
+
+import gzip
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+
+DEFAULT_HISTORY_SIZE = int(os.getenv("AGENT_HISTORY_SIZE", "200"))
+DEFAULT_HISTORY_DIR = Path(os.getenv(
+    "AGENT_HISTORY_DIR", Path(__file__).parent.parent / ".cache" / "agent_history"))
+
+
+class SpillingHistory:
+    """内存环形缓冲 + 压缩JSONL溢出文件"""
+
+    def __init__(self, maxlen: int = DEFAULT_HISTORY_SIZE,
+                 spill_path: Optional[Path] = None, spill_batch: Optional[int] = None):
+        if maxlen < 1:
+            raise ValueError("maxlen 必须大于0")
+        self.maxlen = maxlen
+        self.spill_path = Path(spill_path) if spill_path else None
+        # 攒够一批再写，避免每条记录都新建一个gzip成员
+        self.spill_batch = spill_batch or max(1, maxlen // 4)
+        self._recent: deque = deque()
+        self.spilled = 0
+        self.dropped = 0
+
+    def append(self, entry: Any):
+        if len(self._recent) >= self.maxlen:
+            count = min(self.spill_batch, len(self._recent))
+            self._spill([self._recent.popleft() for _ in range(count)])
+        self._recent.append(entry)
+
+    def _spill(self, entries: list):
+        if self.spill_path is None:
+            self.dropped += len(entries)
+            return
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        lines = "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in entries)
+        with open(self.spill_path, "ab") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            gz.write(lines.encode("utf-8"))
+        self.spilled += len(entries)
+
+    def iter_spilled(self) -> Iterator[Any]:
+        if self.spill_path is None or not self.spill_path.exists():
+            return
+        # gzip 模块会依次读取文件中的多个成员
+        with gzip.open(self.spill_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def __iter__(self) -> Iterator[Any]:
+        yield from self.iter_spilled()
+        # 拷贝一份，迭代期间允许继续 append
+        yield from list(self._recent)
+
+    def recent(self, n: Optional[int] = None) -> list:
+        """最近 n 条（不读磁盘；n 最多为内存中的条数）"""
+        items = list(self._recent)
+        return items if n is None else items[-n:] if n > 0 else []
+
+    def __len__(self) -> int:
+        """可迭代到的条目数（不含已丢弃的）"""
+        return self.spilled + len(self._recent)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __repr__(self) -> str:
+        return (f"SpillingHistory(in_memory={len(self._recent)}, spilled={self.spilled}, "
+                f"dropped={self.dropped}, spill_path={self.spill_path})")
@@ -0,0 +1,482 @@
+"""
+🔌 Agent共享LLM客户端池
+========================
+
+所有Agent通过同一个 AsyncOpenAI 兼容客户端（复用 config/deepseek_client.py 的配置）调用模型：
+- 按角色配置模型、temperature、max_tokens
+- 全局并发上限 + 每个Agent的并发上限
+- 每次调用记录延迟与token用量，包括 DeepSeek 前缀缓存的命中/未命中token
+- stream() 逐段产出模型输出，用于向网页实时推送
+- 可挂载卡带录制/回放全部请求，离线复现基准测试（见 webapp/cassette.py）
+- complete() 支持截止时间、抖动退避重试和超过 p95 后的对冲请求（见 webapp/resilience.py）
+- 调用前预估提示词token，传入 TokenBudget 时按预算预检并记账（见 webapp/token_budget.py）
+
+未设置 DEEPSEEK_API_KEY 时 available 为 False，Agent 会退回本地模拟输出。
+
+使用方式：
+    pool = LLMClientPool(max_concurrency=8, per_agent_concurrency=2)
+    result = await pool.complete("engineer", messages, agent="工程师·Atlas")
+    print(result.content, result.latency_s, result.prompt_tokens)
+    async for text in pool.stream("engineer", messages):
+        print(text, end="")
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Optional
+
+from webapp.cassette import Cassette
+from webapp.resilience import (
+    DeadlineExceededError, ExtraAttempts, LatencyWindow, ResilienceStats, RetryPolicy, is_retryable,
+    quantile,
+)
+from webapp.token_budget import TokenBudget, count_tokens
+
+
+def _retrieve_exception(task: asyncio.Task):
+    """落败请求的异常无人等待，在这里取出，避免事件循环报“异常未被获取”"""
+    if not task.cancelled():
+        task.exception()
+
+
+@dataclass(frozen=True)
+class RoleModelConfig:
+    """单个角色的模型参数"""
+    model: str = "deepseek-chat"
+    temperature: float = 0.7
+    max_tokens: int = 2000
+
+
+# 角色 -> 模型参数（键为 AgentRole.value）
+ROLE_MODEL_CONFIG: dict[str, RoleModelConfig] = {
+    "commander": RoleModelConfig(temperature=0.3, max_tokens=1500),
+    "planner": RoleModelConfig(temperature=0.4, max_tokens=2000),
+    "researcher": RoleModelConfig(temperature=0.2, max_tokens=2000),
+    "reflector": RoleModelConfig(temperature=0.1, max_tokens=1000),
+    "content": RoleModelConfig(temperature=0.7, max_tokens=4000),
+    "designer": RoleModelConfig(temperature=0.8, max_tokens=2000),
+    "engineer": RoleModelConfig(temperature=0.2, max_tokens=4000),
+    "reviewer": RoleModelConfig(temperature=0.1, max_tokens=2000),
+}
+
+
+@dataclass
+class LLMResult:
+    """一次模型调用的结果"""
+    content: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency_s: float
+    usage: dict = field(default_factory=dict)
+    estimated_prompt_tokens: int = 0
+
+    @property
+    def cache_hit_tokens(self) -> int:
+        """DeepSeek 上下文硬盘缓存命中的提示词token（计费更低、首token更快）"""
+        return self.usage.get("prompt_cache_hit_tokens") or 0
+
+    @property
+    def cache_miss_tokens(self) -> int:
+        return self.usage.get("prompt_cache_miss_tokens") or 0
+
+
+@dataclass
+class CallStats:
+    """按Agent累计的调用统计"""
+    calls: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cache_hit_tokens: int = 0
+    cache_miss_tokens: int = 0
+    latency_s: float = 0.0
+    # 重试与对冲多发出的请求（服务端同样计费），token为估算值
+    extra_requests: int = 0
+    extra_prompt_tokens: int = 0
+    extra_completion_tokens: int = 0
+
+    def record(self, result: "LLMResult"):
+        self.calls += 1
+        self.prompt_tokens += result.prompt_tokens
+        self.completion_tokens += result.completion_tokens
+        self.cache_hit_tokens += result.cache_hit_tokens
+        self.cache_miss_tokens += result.cache_miss_tokens
+        self.latency_s += result.latency_s
+
+    @property
+    def cache_hit_rate(self) -> float:
+        total = self.cache_hit_tokens + self.cache_miss_tokens
+        return round(self.cache_hit_tokens / total, 3) if total else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cache_hit_tokens": self.cache_hit_tokens,
+            "cache_miss_tokens": self.cache_miss_tokens,
+            "cache_hit_rate": self.cache_hit_rate,
+            "avg_latency_s": round(self.latency_s / self.calls, 3) if self.calls else 0.0,
+            "extra_requests": self.extra_requests,
+            "extra_tokens": self.extra_prompt_tokens + self.extra_completion_tokens,
+        }
+
+
+class LLMClientPool:
+    """共享客户端 + 并发控制 + 用量统计"""
+
+    def __init__(self, max_concurrency: int = 8, per_agent_concurrency: int = 2,
+                 role_config: Optional[dict[str, RoleModelConfig]] = None,
+                 client_factory: Optional[Callable[[], Any]] = None,
+                 cassette: Optional[Cassette] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 deadline_s: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self.per_agent_concurrency = per_agent_concurrency
+        self.role_config = {**ROLE_MODEL_CONFIG, **(role_config or {})}
+        self.client_factory = client_factory
+        self.cassette = cassette
+        self._client = None
+        self._has_dotenv_key: Optional[bool] = None
+        self._global_limit = asyncio.Semaphore(max_concurrency)
+        self._agent_limits: dict[str, asyncio.Semaphore] = {}
+        self.stats: dict[str, CallStats] = {}
+        self.role_stats: dict[str, CallStats] = {}
+        self.retry = retry or RetryPolicy()
+        # 每次调用的默认截止时间（秒），None 表示不限
+        self.deadline_s = deadline_s
+        self.latency: dict[str, LatencyWindow] = {}
+        self.resilience = ResilienceStats()
+
+    @property
+    def available(self) -> bool:
+        """是否可以发起真实调用（API Key 由 config/deepseek_client.py 从环境变量或 .env 读取）"""
+        if self.client_factory is not None:
+            return True
+        if self.cassette is not None and self.cassette.mode == "replay":
+            return True
+        if os.getenv("DEEPSEEK_API_KEY"):
+            return True
+        if self._has_dotenv_key is None:
+            # 只有 .env 中的 Key 需要导入配置模块（连带 openai、dotenv），只导入一次
+            from config.deepseek_client import DEEPSEEK_API_KEY
+            self._has_dotenv_key = bool(DEEPSEEK_API_KEY)
+        return self._has_dotenv_key
+
+    @property
+    def client(self):
+        if self._client is None:
+            if self.client_factory is not None:
+                self._client = self.client_factory()
+            else:
+                # 延迟导入：未使用LLM时不为 openai 的导入付出启动时间
+                from config.deepseek_client import get_async_client
+                self._client = get_async_client(max_connections=self.max_concurrency)
+        return self._client
+
+    def config_for(self, role: str) -> RoleModelConfig:
+        return self.role_config.get(role, RoleModelConfig())
+
+    async def _create(self, **request) -> dict:
+        """发起请求并把响应规范化为普通字典（挂载卡带时由卡带录制或回放）"""
+        if self.cassette is not None:
+            return await self.cassette.create(request, lambda: self._call(**request))
+        return await self._call(**request)
+
+    async def _call(self, **request) -> dict:
+        response = await self.client.chat.completions.create(**request)
+        usage = response.usage.model_dump() if response.usage else {}
+        return {
+            "content": response.choices[0].message.content or "",
+            "model": response.model,
+            "usage": usage,
+        }
+
+    async def _stream(self, **request) -> AsyncIterator[dict]:
+        """流式请求：逐段产出 {"content": ...}，最后产出 {"model": ..., "usage": ...}"""
+        chunks = (self.cassette.stream(request, lambda: self._call_stream(**request))
+                  if self.cassette is not None else self._call_stream(**request))
+        async for chunk in chunks:
+            yield chunk
+
+    async def _call_stream(self, **request) -> AsyncIterator[dict]:
+        response = await self.client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield {"content": chunk.choices[0].delta.content}
+            if chunk.usage:
+                yield {"model": chunk.model, "usage": chunk.usage.model_dump()}
+
+    def _finish(self, role: str, agent: str, data: dict, latency: float, estimated: int,
+                budget: Optional[TokenBudget]) -> LLMResult:
+        usage = data["usage"]
+        result = LLMResult(
+            content=data["content"],
+            model=data["model"],
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            latency_s=latency,
+            usage=usage,
+            estimated_prompt_tokens=estimated,
+        )
+        self.stats.setdefault(agent, CallStats()).record(result)
+        self.role_stats.setdefault(role, CallStats()).record(result)
+        if budget is not None:
+            budget.record(role, agent, result.model, result.prompt_tokens,
+                          result.completion_tokens, latency, result.cache_hit_tokens)
+        return result
+
+    def _record_extra(self, role: str, agent: str, model: str, extra: ExtraAttempts,
+                      completion_tokens: int, latency: float, budget: Optional[TokenBudget]):
+        """
+        记入重试与对冲多发出的请求：每个请求按完整提示词计；被取消的对冲请求
+        按胜出请求的输出长度估算输出token，失败后被重试的请求不计输出
+        """
+        requests = extra.retries + extra.hedges
+        if not requests:
+            return
+        prompt = extra.prompt_tokens * requests
+        completion = completion_tokens * extra.hedges
+        for stats in (self.stats.setdefault(agent, CallStats()), self.role_stats.setdefault(role, CallStats())):
+            stats.extra_requests += requests
+            stats.extra_prompt_tokens += prompt
+            stats.extra_completion_tokens += completion
+        if budget is not None:
+            for _ in range(extra.retries):
+                budget.record(role, agent, model, extra.prompt_tokens, 0, 0.0)
+            for _ in range(extra.hedges):
+                budget.record(role, agent, model, extra.prompt_tokens, completion_tokens, latency)
+
+    def _record_error(self, role: str, agent: str):
+        self.stats.setdefault(agent, CallStats()).errors += 1
+        self.role_stats.setdefault(role, CallStats()).errors += 1
+
+    async def _attempt(self, role: str, request: dict, extra: ExtraAttempts) -> dict:
+        """单次尝试；超过该角色 p95 仍未返回、有空余并发且预算允许时发出对冲请求"""
+        window = self.latency.setdefault(role, LatencyWindow())
+        hedge_after = window.hedge_delay(self.retry) if self.cassette is None else None
+        started = time.perf_counter()
+        primary = asyncio.create_task(self._create(**request))
+        primary.add_done_callback(_retrieve_exception)
+        tasks = {primary}
+        backup_started = None
+        try:
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done and not self._global_limit.locked() and extra.reserve():
+                    # 未被占满时 acquire 立即返回；名额在对冲请求结束（含被取消）时释放
+                    await self._global_limit.acquire()
+                    backup_started = time.perf_counter()
+                    backup = asyncio.create_task(self._create(**request))
+                    backup.add_done_callback(_retrieve_exception)
+                    backup.add_done_callback(lambda _: self._global_limit.release())
+                    tasks.add(backup)
+                    extra.hedges += 1
+                    self.resilience.hedges_fired += 1
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    now = time.perf_counter()
+                    if task is primary:
+                        window.attempts.append(now - started)
+                        if backup_started is None:
+                            window.unhedged.append(now - started)
+                    else:
+                        window.attempts.append(now - backup_started)
+                        self.resilience.hedge_wins += 1
+                        self.resilience.estimated_saved_s += window.expected_remaining(now - started)
+                    return task.result()
+            raise error
+        finally:
+            # 取消落后的请求（以及被截止时间打断时仍在进行的请求）
+            for task in tasks:
+                task.cancel()
+
+    async def _call_with_retries(self, role: str, request: dict, expires: Optional[float],
+                                 extra: ExtraAttempts) -> dict:
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = None if expires is None else expires - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                self.resilience.deadline_exceeded += 1
+                raise DeadlineExceededError(f"{role} 调用超过截止时间")
+            try:
+                return await asyncio.wait_for(self._attempt(role, request, extra), remaining)
+            except Exception as e:
+                if expires is not None and time.monotonic() >= expires:
+                    self.resilience.deadline_exceeded += 1
+                    raise DeadlineExceededError(f"{role} 调用超过截止时间（第 {attempt} 次尝试）") from e
+                if not is_retryable(e) or attempt >= self.retry.max_attempts or not extra.reserve():
+                    raise
+                delay = self.retry.backoff(attempt)
+                if expires is not None and time.monotonic() + delay >= expires:
+                    self.resilience.deadline_exceeded += 1
+                    raise DeadlineExceededError(f"{role} 重试等待将超过截止时间") from e
+                self.resilience.retries += 1
+                extra.retries += 1
+                await asyncio.sleep(delay)
+
+    async def complete(self, role: str, messages: list[dict], agent: Optional[str] = None,
+                       budget: Optional[TokenBudget] = None, deadline: Optional[float] = None,
+                       **overrides) -> LLMResult:
+        """
+        以角色配置调用模型
+
+        Args:
+            role: AgentRole.value
+            messages: OpenAI 格式的消息列表
+            agent: 用于并发限制和统计的Agent名称（默认与角色相同）
+            budget: 本次运行的token预算；预计超出硬上限时抛出 BudgetExceededError
+            deadline: 本次调用（含重试与对冲）的截止时间（秒），默认取 deadline_s
+            **overrides: 覆盖 model / temperature / max_tokens
+        """
+        agent = agent or role
+        config = replace(self.config_for(role), **overrides)
+        agent_limit = self._agent_limits.setdefault(
+            agent, asyncio.Semaphore(self.per_agent_concurrency)
+        )
+        estimated = count_tokens(messages)
+        reserved = budget.reserve(role, estimated, config.max_tokens) if budget is not None else 0
+        deadline = deadline if deadline is not None else self.deadline_s
+        expires = time.monotonic() + deadline if deadline else None
+        request = {
+            "model": config.model,
+            "messages": messages,
+            "temperature": config.temperature,
+            "max_tokens": config.max_tokens,
+        }
+        # 路由到非默认模型时单独统计延迟，避免推理模型的慢请求抬高该角色的对冲阈值
+        window_key = role if config.model == self.config_for(role).model else f"{role}@{config.model}"
+        extra = ExtraAttempts(role, budget, estimated, config.max_tokens)
+
+        completion_tokens, latency = 0, 0.0
+        try:
+            # 先占用Agent自身的名额，避免排队时占着全局名额
+            async with agent_limit, self._global_limit:
+                started = time.perf_counter()
+                try:
+                    data = await self._call_with_retries(window_key, request, expires, extra)
+                except Exception:
+                    self._record_error(role, agent)
+                    raise
+                latency = time.perf_counter() - started
+
+            self.latency.setdefault(window_key, LatencyWindow()).calls.append(latency)
+            result = self._finish(role, agent, data, latency, estimated, budget)
+            completion_tokens = result.completion_tokens
+            return result
+        finally:
+            # 成功时 _finish 已记入实际用量；失败或被取消时只释放预留
+            self._record_extra(role, agent, config.model, extra, completion_tokens, latency, budget)
+            extra.release()
+            if budget is not None:
+                budget.release(role, reserved)
+
+    async def stream(self, role: str, messages: list[dict], agent: Optional[str] = None,
+                     budget: Optional[TokenBudget] = None,
+                     on_result: Optional[Callable[[LLMResult], None]] = None,
+                     **overrides) -> AsyncIterator[str]:
+        """
+        与 complete 相同的配置、限流与记账，但逐段产出文本
+
+        生成器结束后用量才会计入统计，并以完整的 LLMResult 调用 on_result（如模型路由记账）；
+        提前关闭生成器时不记账。
+        """
+        agent = agent or role
+        config = replace(self.config_for(role), **overrides)
+        agent_limit = self._agent_limits.setdefault(
+            agent, asyncio.Semaphore(self.per_agent_concurrency)
+        )
+        estimated = count_tokens(messages)
+        reserved = budget.reserve(role, estimated, config.max_tokens) if budget is not None else 0
+
+        parts: list[str] = []
+        data = {"model": config.model, "usage": {}}
+        try:
+            async with agent_limit, self._global_limit:
+                started = time.perf_counter()
+                try:
+                    async for chunk in self._stream(
+                        model=config.model,
+                        messages=messages,
+                        temperature=config.temperature,
+                        max_tokens=config.max_tokens,
+                    ):
+                        if "content" in chunk:
+                            parts.append(chunk["content"])
+                            yield chunk["content"]
+                        else:
+                            data.update(chunk)
+                except Exception:
+                    self._record_error(role, agent)
+                    raise
+                latency = time.perf_counter() - started
+
+            result = self._finish(role, agent, {**data, "content": "".join(parts)}, latency, estimated, budget)
+            if on_result is not None:
+                on_result(result)
+        finally:
+            if budget is not None:
+                budget.release(role, reserved)
+
+    def report(self) -> dict:
+        return {agent: stats.summary() for agent, stats in self.stats.items()}
+
+    def resilience_report(self) -> dict:
+        """重试/对冲计数，以及各角色单次请求与整次调用的延迟分位数（秒）"""
+        def percentiles(samples) -> dict:
+            return {f"p{int(q * 100)}": round(quantile(samples, q) or 0.0, 3) for q in (0.5, 0.95, 0.99)}
+        return {
+            **self.resilience.summary(),
+            "roles": {
+                role: {
+                    "attempt": percentiles(window.attempts),
+                    "unhedged": percentiles(window.unhedged),
+                    "call": percentiles(window.calls),
+                }
+                for role, window in self.latency.items()
+            },
+        }
+
+    def cache_report(self) -> dict:
+        """按角色统计前缀缓存命中率"""
+        return {
+            role: {
+                "hit_tokens": stats.cache_hit_tokens,
+                "miss_tokens": stats.cache_miss_tokens,
+                "hit_rate": stats.cache_hit_rate,
+            }
+            for role, stats in self.role_stats.items()
+        }
+
+
+_default_pool: Optional[LLMClientPool] = None
+
+
+def get_default_pool() -> LLMClientPool:
+    """进程内共享的默认客户端池"""
+    global _default_pool
+    if _default_pool is None:
+        cassette_path = os.getenv("LLM_CASSETTE")
+        _default_pool = LLMClientPool(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            per_agent_concurrency=int(os.getenv("LLM_PER_AGENT_CONCURRENCY", "2")),
+            cassette=Cassette(
+                cassette_path,
+                mode=os.getenv("LLM_CASSETTE_MODE", "replay"),
+                latency_scale=float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "0")),
+            ) if cassette_path else None,
+            deadline_s=float(os.getenv("LLM_CALL_DEADLINE_S", "0")) or None,
+        )
+    return _default_pool
@@ -0,0 +1,121 @@
+"""
+📮 Agent消息总线
+================
+
+基于 asyncio 的进程内消息总线：
+- 每个角色一个有界邮箱（asyncio.Queue），邮箱满时 send 会等待（背压）
+- request/response 通过 correlation_id 关联，请求方 await 一个 Future 拿到回复
+- 广播主题：订阅者各自持有一个有界队列，publish 同样受背压约束
+
+总线只依赖消息对象的 to_agent / correlation_id / message_type 属性（见 agents.AgentMessage），
+Agent 以长期运行的消费者身份从邮箱取消息（见 BaseAgent.serve）。
+
+使用方式：
+    bus = MessageBus(mailbox_size=100)
+    reply = await bus.request(AgentMessage(AgentRole.COMMANDER, AgentRole.ENGINEER, "实现登录接口", "request"))
+    # 消费者一侧
+    message = await bus.receive(AgentRole.ENGINEER)
+    await bus.respond(message, result)
+"""
+
+import asyncio
+import uuid
+from collections import Counter
+from dataclasses import replace
+from typing import Any, Hashable, Optional
+
+
+DEFAULT_MAILBOX_SIZE = 100
+
+
+class MessageBus:
+    """有界邮箱 + 请求/响应关联 + 广播主题"""
+
+    def __init__(self, mailbox_size: int = DEFAULT_MAILBOX_SIZE):
+        self.mailbox_size = mailbox_size
+        self._mailboxes: dict[Hashable, asyncio.Queue] = {}
+        self._topics: dict[str, set[asyncio.Queue]] = {}
+        self._pending: dict[str, asyncio.Future] = {}
+        self.stats: Counter = Counter()
+
+    def mailbox(self, address: Hashable) -> asyncio.Queue:
+        queue = self._mailboxes.get(address)
+        if queue is None:
+            queue = self._mailboxes[address] = asyncio.Queue(self.mailbox_size)
+        return queue
+
+    async def send(self, message: Any):
+        """投递到 message.to_agent 的邮箱；邮箱满时等待"""
+        await self.mailbox(message.to_agent).put(message)
+        self.stats["sent"] += 1
+
+    async def receive(self, address: Hashable) -> Any:
+        message = await self.mailbox(address).get()
+        self.stats["received"] += 1
+        return message
+
+    async def request(self, message: Any, timeout: Optional[float] = None) -> Any:
+        """发送请求并等待对应的回复（超时抛 asyncio.TimeoutError）"""
+        correlation_id = message.correlation_id or uuid.uuid4().hex
+        message = replace(message, correlation_id=correlation_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[correlation_id] = future
+        try:
+            await self.send(message)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(correlation_id, None)
+
+    async def respond(self, request: Any, content: Any = None,
+                      error: Optional[BaseException] = None):
+        """
+        回复一个请求：请求方仍在等待时直接唤醒它；
+        否则（超时已放弃，或请求本身只是 send）投递到发送方的邮箱
+        """
+        future = self._pending.get(request.correlation_id) if request.correlation_id else None
+        if future is not None:
+            if not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(content)
+            self.stats["responded"] += 1
+            return
+        if error is not None:
+            content = {"status": "failed", "error": f"{type(error).__name__}: {error}"}
+        await self.send(replace(
+            request, from_agent=request.to_agent, to_agent=request.from_agent,
+            content=content, message_type="response"
+        ))
+
+    def subscribe(self, topic: str, maxsize: Optional[int] = None) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize or self.mailbox_size)
+        self._topics.setdefault(topic, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, topic: str, queue: asyncio.Queue):
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._topics[topic]
+
+    async def publish(self, topic: str, payload: Any) -> int:
+        """广播给当前所有订阅者，返回送达数量"""
+        subscribers = list(self._topics.get(topic, ()))
+        for queue in subscribers:
+            await queue.put(payload)
+        self.stats["published"] += 1
+        return len(subscribers)
+
+    def snapshot(self) -> dict:
+        """各邮箱积压、待回复请求数与累计计数"""
+        return {
+            "mailboxes": {
+                getattr(address, "value", address): queue.qsize()
+                for address, queue in self._mailboxes.items()
+            },
+            "pending_requests": len(self._pending),
+            "topics": {topic: len(subs) for topic, subs in self._topics.items()},
+            **self.stats,
+        }
@@ -0,0 +1,118 @@
+"""
+🧭 模型路由
+============
+
+按角色和任务复杂度在 deepseek-chat 与 deepseek-reasoner 之间选择模型：
+- 复杂度信号：提示词长度、角色是否以推理/规划为主、该角色近期的反思得分
+- 默认走 deepseek-chat；信号累计达到阈值才用 deepseek-reasoner
+- 反思不通过（得分率低于 escalate_below）时，协调器用 deepseek-reasoner 重做一次（升级）
+- 按路由（模型）统计调用次数、延迟、token 与估算费用，以及升级的成功率
+
+使用方式：
+    router = ModelRouter()
+    orchestrator = EnhancedOrchestrator(router=router)
+    ...
+    print(router.report())
+"""
+
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from webapp.token_budget import estimate_cost
+
+
+CHAT_MODEL = "deepseek-chat"
+REASONER_MODEL = "deepseek-reasoner"
+
+
+@dataclass(frozen=True)
+class RoutingRules:
+    # 以推理、规划、审查为主的角色
+    reasoning_roles: frozenset = frozenset({"commander", "planner", "reviewer"})
+    long_prompt_tokens: int = 3000      # 提示词超过此长度视为复杂任务
+    low_score: float = 0.6              # 角色近期得分率低于此值视为复杂
+    reasoner_threshold: int = 2         # 复杂度信号达到此数量时使用推理模型
+    escalate_below: float = 0.6         # 反思得分率低于此值时升级到推理模型重做
+    score_window: int = 10
+
+
+@dataclass
+class RouteStats:
+    """单个路由（模型）的累计统计"""
+    calls: int = 0
+    latency_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    reasons: Counter = field(default_factory=Counter)
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "avg_latency_s": round(self.latency_s / self.calls, 3) if self.calls else 0.0,
+            "tokens_in": self.prompt_tokens,
+            "tokens_out": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "avg_cost_usd": round(self.cost_usd / self.calls, 6) if self.calls else 0.0,
+            "reasons": dict(self.reasons),
+        }
+
+
+class ModelRouter:
+    """按角色与复杂度选择模型，并统计各路由的延迟与费用"""
+
+    def __init__(self, rules: Optional[RoutingRules] = None):
+        self.rules = rules or RoutingRules()
+        self.scores: dict[str, deque] = {}
+        self.routes: dict[str, RouteStats] = {}
+        self.escalations = Counter()
+
+    def recent_score(self, role: str) -> Optional[float]:
+        scores = self.scores.get(role)
+        return sum(scores) / len(scores) if scores else None
+
+    def choose(self, role: str, prompt_tokens: int) -> tuple[str, str]:
+        """返回 (模型, 选择原因)"""
+        rules = self.rules
+        signals = []
+        if role in rules.reasoning_roles:
+            signals.append("推理型角色")
+        if prompt_tokens > rules.long_prompt_tokens:
+            signals.append(f"长提示词 {prompt_tokens}")
+        score = self.recent_score(role)
+        if score is not None and score < rules.low_score:
+            signals.append(f"近期得分率 {score:.2f}")
+        if len(signals) >= rules.reasoner_threshold:
+            return REASONER_MODEL, "、".join(signals)
+        return CHAT_MODEL, "、".join(signals) or "常规任务"
+
+    def record_call(self, model: str, reason: str, result) -> None:
+        """记录一次调用（result 为 LLMResult）"""
+        stats = self.routes.setdefault(model, RouteStats())
+        stats.calls += 1
+        stats.latency_s += result.latency_s
+        stats.prompt_tokens += result.prompt_tokens
+        stats.completion_tokens += result.completion_tokens
+        stats.cost_usd += estimate_cost(model, result.prompt_tokens, result.completion_tokens,
+                                        result.cache_hit_tokens)
+        stats.reasons[reason] += 1
+
+    def record_score(self, role: str, ratio: Optional[float]) -> None:
+        if ratio is None:
+            return
+        self.scores.setdefault(role, deque(maxlen=self.rules.score_window)).append(ratio)
+
+    def should_escalate(self, model: Optional[str], ratio: Optional[float]) -> bool:
+        return (ratio is not None and ratio < self.rules.escalate_below
+                and model != REASONER_MODEL)
+
+    def record_escalation(self, improved: bool) -> None:
+        self.escalations["total"] += 1
+        self.escalations["improved" if improved else "not_improved"] += 1
+
+    def report(self) -> dict:
+        return {
+            "routes": {model: stats.summary() for model, stats in self.routes.items()},
+            "escalations": dict(self.escalations),
+        }
@@ -0,0 +1,155 @@
+"""
+🩺 生产环境调试端点
+====================
+
+- GET /debug/profile?seconds=N  对所有线程做低开销栈采样，返回折叠栈（collapsed stack）文本，
+                                 可直接交给 flamegraph.pl 或 speedscope 生成火焰图
+- GET /debug/memory              对比两次 tracemalloc 快照，返回内存增长最多的位置
+
+默认关闭。启用方式（两个环境变量都需要设置）：
+    ENABLE_DEBUG_ENDPOINTS=1
+    DEBUG_ADMIN_TOKEN=<随机长字符串>
+
+请求时携带 Authorization: Bearer <token>。
+
+使用方式：
+    from webapp.profiling import debug_router
+    app.include_router(debug_router)
+"""
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+
+MAX_PROFILE_SECONDS = 60
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+def require_admin(authorization: Optional[str] = Header(default=None)):
+    """未启用时返回404，隐藏端点的存在"""
+    token = os.getenv("DEBUG_ADMIN_TOKEN", "")
+    if not os.getenv("ENABLE_DEBUG_ENDPOINTS") or not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {token}"
+    if not authorization or not hmac.compare_digest(authorization, expected):
+        raise HTTPException(status_code=403, detail="需要管理员令牌")
+
+
+def _frame_stack(frame) -> list[str]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def sample_stacks(seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL) -> tuple[Counter, int]:
+    """
+    在当前线程中周期性读取所有其他线程的调用栈
+
+    Returns:
+        (折叠栈计数, 采样轮数)
+    """
+    me = threading.get_ident()
+    stacks: Counter = Counter()
+    rounds = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = [names.get(ident, str(ident))] + _frame_stack(frame)
+            stacks[";".join(stack)] += 1
+        rounds += 1
+        time.sleep(interval)
+    return stacks, rounds
+
+
+def collapse(stacks: Counter) -> str:
+    """Brendan Gregg 折叠栈格式：每行 `帧1;帧2;... 次数`"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class MemoryTracker:
+    """tracemalloc 快照对比；首次调用时才开始追踪"""
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+
+    def diff(self, limit: int, frames: int) -> dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self.baseline = tracemalloc.take_snapshot()
+            return {"status": "started", "message": "已开始追踪，再次调用以查看增长"}
+        snapshot = tracemalloc.take_snapshot()
+        stats = snapshot.compare_to(self.baseline, "lineno")
+        self.baseline = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "status": "diff",
+            "traced_current_kb": round(current / 1024, 1),
+            "traced_peak_kb": round(peak / 1024, 1),
+            "top": [
+                {
+                    "location": str(stat.traceback[0]),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+    def stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+
+
+debug_router = APIRouter(prefix="/debug", tags=["调试"], dependencies=[Depends(require_admin)])
+_profile_lock = asyncio.Lock()
+memory_tracker = MemoryTracker()
+
+
+@debug_router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(5, gt=0, le=MAX_PROFILE_SECONDS),
+    interval: float = Query(DEFAULT_SAMPLE_INTERVAL, ge=0.001, le=1),
+):
+    """采样 N 秒并返回折叠栈文件（同一时间只允许一个采样）"""
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="已有采样正在进行")
+    async with _profile_lock:
+        stacks, rounds = await asyncio.to_thread(sample_stacks, seconds, interval)
+    return PlainTextResponse(
+        collapse(stacks),
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{int(time.time())}.collapsed"',
+            "X-Sample-Rounds": str(rounds),
+        }
+    )
+
+
+@debug_router.get("/memory")
+async def memory(
+    limit: int = Query(20, ge=1, le=200),
+    frames: int = Query(1, ge=1, le=50),
+    stop: bool = False,
+):
+    """与上一次快照对比内存分配；stop=true 关闭追踪"""
+    if stop:
+        memory_tracker.stop()
+        return {"status": "stopped"}
+    return await asyncio.to_thread(memory_tracker.diff, limit, frames)
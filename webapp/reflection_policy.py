@@ -0,0 +1,158 @@
+"""
+🎚️ 自适应反思策略
+==================
+
+根据角色近期得分、研究结果的 confidence 和输出长度，决定每个任务的反思深度：
+- full:  完整反思
+- light: 只看输出开头、只要分数的轻量反思
+- skip:  不反思，沿用该角色近期平均分
+
+高置信度的决定会按 audit_rate 抽样改为完整反思（抽检），抽检得分与该角色基线的差距
+即质量漂移；漂移超过阈值时暂停该角色的跳过/轻量反思，直到抽检恢复正常。
+
+使用方式：
+    policy = ReflectionPolicy(ReflectionThresholds(audit_rate=0.1))
+    orchestrator = EnhancedOrchestrator(reflection_policy=policy)
+    ...
+    print(policy.summary())
+"""
+
+import random
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+
+ReflectionDepth = Literal["skip", "light", "full"]
+
+
+@dataclass(frozen=True)
+class ReflectionThresholds:
+    min_history: int = 5            # 角色至少有这么多次完整反思后才允许降级
+    skip_score: float = 0.85        # 近期得分率（total/max）不低于此值时可跳过
+    light_score: float = 0.7        # 不低于此值时可轻量反思
+    min_confidence: float = 0.8     # 研究 confidence 低于此值时必须完整反思
+    max_output_chars: int = 4000    # 输出超过此长度时必须完整反思
+    audit_rate: float = 0.1         # 降级决定中抽检（改为完整反思）的比例
+    window: int = 20                # 计算近期得分的窗口
+    drift_alert: float = 0.1        # 抽检得分率比基线低这么多即视为漂移
+
+
+@dataclass
+class RoleQuality:
+    """单个角色的得分窗口与决策计数"""
+    scores: deque
+    audits: deque
+    decisions: Counter
+    suspended: bool = False
+
+    @property
+    def baseline(self) -> Optional[float]:
+        return sum(self.scores) / len(self.scores) if self.scores else None
+
+    @property
+    def drift(self) -> Optional[float]:
+        """抽检得分率相对基线的下降幅度（正数表示变差）"""
+        if not self.audits or self.baseline is None:
+            return None
+        return self.baseline - sum(self.audits) / len(self.audits)
+
+
+def score_ratio(evaluation: dict) -> Optional[float]:
+    try:
+        return evaluation["total_score"] / evaluation["max_score"]
+    except (KeyError, TypeError, ZeroDivisionError):
+        return None
+
+
+class ReflectionPolicy:
+    """决定反思深度，并跟踪抽检得分的漂移"""
+
+    def __init__(self, thresholds: Optional[ReflectionThresholds] = None,
+                 rng: Optional[random.Random] = None):
+        self.thresholds = thresholds or ReflectionThresholds()
+        self.rng = rng or random.Random()
+        self.roles: dict[str, RoleQuality] = {}
+
+    def _role(self, role: str) -> RoleQuality:
+        quality = self.roles.get(role)
+        if quality is None:
+            window = self.thresholds.window
+            quality = self.roles[role] = RoleQuality(deque(maxlen=window), deque(maxlen=window), Counter())
+        return quality
+
+    def decide(self, role: str, research: Optional[dict], output: str,
+               batched: bool = False) -> tuple[ReflectionDepth, str, bool]:
+        """
+        Args:
+            batched: 批量反思只有完整评估，此时 light 决定改为 full 后再计数
+
+        Returns:
+            (反思深度, 原因, 是否为抽检)
+        """
+        t = self.thresholds
+        quality = self._role(role)
+        confidence = (research or {}).get("confidence", 0.0)
+        baseline = quality.baseline
+
+        if quality.suspended:
+            depth, reason = "full", "质量漂移，暂停降级"
+        elif len(quality.scores) < t.min_history:
+            depth, reason = "full", "历史评估不足"
+        elif confidence < t.min_confidence:
+            depth, reason = "full", f"研究置信度 {confidence} 过低"
+        elif len(output) > t.max_output_chars:
+            depth, reason = "full", "输出过长"
+        elif baseline >= t.skip_score:
+            depth, reason = "skip", f"近期得分率 {baseline:.2f}"
+        elif baseline >= t.light_score:
+            depth, reason = "light", f"近期得分率 {baseline:.2f}"
+        else:
+            depth, reason = "full", f"近期得分率 {baseline:.2f} 偏低"
+
+        if batched and depth == "light":
+            depth, reason = "full", f"批量反思（原决定: 轻量，{reason}）"
+
+        audit = depth != "full" and self.rng.random() < t.audit_rate
+        if audit:
+            depth, reason = "full", f"抽检（原决定: {reason}）"
+        quality.decisions["audit" if audit else depth] += 1
+        return depth, reason, audit
+
+    def record(self, role: str, evaluation: dict, depth: ReflectionDepth, audit: bool = False):
+        """记录反思结果：完整反思更新基线，抽检更新漂移；轻量反思只作为当次结果"""
+        ratio = score_ratio(evaluation)
+        if ratio is None or depth == "skip" or evaluation.get("fallback"):
+            return
+        quality = self._role(role)
+        if audit or quality.suspended:
+            # 抽检，以及暂停期间的完整反思，都用来衡量相对基线的漂移
+            quality.audits.append(ratio)
+            drift = quality.drift
+            quality.suspended = drift is not None and drift > self.thresholds.drift_alert
+        elif depth == "full":
+            quality.scores.append(ratio)
+
+    def skipped_evaluation(self, role: str, reason: str) -> dict:
+        """跳过反思时返回的占位评估（分数取该角色近期基线）"""
+        baseline = self._role(role).baseline or 0.0
+        return {
+            "evaluation_target": role,
+            "skipped": True,
+            "reason": reason,
+            "estimated_score_ratio": round(baseline, 3),
+            "issues_found": [],
+            "improvements": []
+        }
+
+    def summary(self) -> dict:
+        return {
+            role: {
+                "decisions": dict(quality.decisions),
+                "baseline": round(quality.baseline, 3) if quality.baseline is not None else None,
+                "audits": len(quality.audits),
+                "drift": round(quality.drift, 3) if quality.drift is not None else None,
+                "suspended": quality.suspended,
+            }
+            for role, quality in self.roles.items()
+        }
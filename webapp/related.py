@@ -0,0 +1,153 @@
+"""
+🔗 相关教程推荐
+================
+
+离线对全部课程文档计算 TF-IDF 相似度，为每个内容ID保存 top-k 近邻，
+写入紧凑的二进制数组文件；线上只做 O(k) 查表，不做任何逐请求打分。
+
+文件格式（小端）：
+    magic "RELG" | k: uint16 | 保留: uint16 | header长度: uint32
+    header: JSON {"ids": [...], "hashes": [...]}
+    neighbors: uint16[n * k]  （NO_NEIGHBOR 表示空位）
+    scores:    float32[n * k]
+
+重新生成：
+    python -m webapp.related
+"""
+
+import json
+import math
+import re
+import struct
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+
+GRAPH_PATH = Path(__file__).parent / "data" / "related.bin"
+DEFAULT_K = 5
+NO_NEIGHBOR = 0xFFFF
+
+_MAGIC = b"RELG"
+_HEADER = struct.Struct("<4sHHI")
+_WORD_RE = re.compile(r"[a-z][a-z0-9_]+")
+_CJK_RE = re.compile(r"[一-鿿]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """英文按单词切分，中文按字符二元组切分"""
+    text = text.lower()
+    tokens = _WORD_RE.findall(text)
+    for run in _CJK_RE.findall(text):
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _tfidf_vectors(docs: list[str]) -> list[dict[str, float]]:
+    """计算 L2 归一化的 TF-IDF 稀疏向量（次线性 tf）"""
+    counts = [Counter(tokenize(doc)) for doc in docs]
+    df = Counter(term for c in counts for term in c)
+    n = len(docs)
+    vectors = []
+    for c in counts:
+        vec = {
+            term: (1 + math.log(tf)) * math.log((1 + n) / (1 + df[term]))
+            for term, tf in c.items()
+        }
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        vectors.append({term: v / norm for term, v in vec.items()})
+    return vectors
+
+
+def build_graph(ids: list[str], docs: list[str], k: int = DEFAULT_K) -> tuple[array, array]:
+    """计算每个文档的 top-k 相似文档"""
+    vectors = _tfidf_vectors(docs)
+    neighbors, scores = array("H"), array("f")
+    for i, vec in enumerate(vectors):
+        sims = []
+        for j, other in enumerate(vectors):
+            if i == j:
+                continue
+            small, large = (vec, other) if len(vec) < len(other) else (other, vec)
+            sims.append((sum(w * large.get(t, 0.0) for t, w in small.items()), j))
+        top = sorted(sims, reverse=True)[:k]
+        top += [(0.0, NO_NEIGHBOR)] * (k - len(top))
+        neighbors.extend(j for _, j in top)
+        scores.extend(s for s, _ in top)
+    return neighbors, scores
+
+
+def write_graph(path: Path, ids: list[str], hashes: list[str],
+                neighbors: array, scores: array, k: int):
+    header = json.dumps({"ids": ids, "hashes": hashes}, ensure_ascii=False).encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, k, 0, len(header)))
+        f.write(header)
+        f.write(neighbors.tobytes())
+        f.write(scores.tobytes())
+
+
+class RelatedGraph:
+    """只读的近邻表"""
+
+    def __init__(self, ids: list[str], hashes: list[str], neighbors: array, scores: array, k: int):
+        self.ids = ids
+        self.hashes = hashes
+        self.rows = {cid: i for i, cid in enumerate(ids)}
+        self.neighbors = neighbors
+        self.scores = scores
+        self.k = k
+
+    @classmethod
+    def load(cls, path: Path = GRAPH_PATH) -> Optional["RelatedGraph"]:
+        if not path.exists():
+            return None
+        data = path.read_bytes()
+        magic, k, _, header_len = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError(f"无效的相似度图文件: {path}")
+        offset = _HEADER.size
+        header = json.loads(data[offset:offset + header_len])
+        offset += header_len
+        n = len(header["ids"])
+        neighbors = array("H")
+        neighbors.frombytes(data[offset:offset + n * k * neighbors.itemsize])
+        offset += n * k * neighbors.itemsize
+        scores = array("f")
+        scores.frombytes(data[offset:offset + n * k * scores.itemsize])
+        return cls(header["ids"], header["hashes"], neighbors, scores, k)
+
+    def related(self, content_id: str, limit: Optional[int] = None) -> Optional[list[tuple[str, float]]]:
+        """O(k) 查询近邻；未知ID返回 None"""
+        row = self.rows.get(content_id)
+        if row is None:
+            return None
+        start = row * self.k
+        result = []
+        for offset in range(min(limit or self.k, self.k)):
+            j = self.neighbors[start + offset]
+            if j == NO_NEIGHBOR:
+                break
+            result.append((self.ids[j], round(self.scores[start + offset], 4)))
+        return result
+
+
+def build_from_index(index, path: Path = GRAPH_PATH, k: int = DEFAULT_K) -> RelatedGraph:
+    """从 ContentIndex 构建并写入相似度图"""
+    index.refresh()
+    entries = [e for e in index.entries.values() if e.hash]
+    ids = [e.content_id for e in entries]
+    hashes = [e.hash for e in entries]
+    neighbors, scores = build_graph(ids, [e.text for e in entries], k)
+    write_graph(path, ids, hashes, neighbors, scores, k)
+    return RelatedGraph(ids, hashes, neighbors, scores, k)
+
+
+if __name__ == "__main__":
+    from webapp.app import BASE_DIR, CURRICULUM
+    from webapp.content_index import ContentIndex
+
+    graph = build_from_index(ContentIndex(BASE_DIR, CURRICULUM))
+    print(f"✅ 已生成相似度图: {GRAPH_PATH} ({len(graph.ids)} 篇文档, k={graph.k})")
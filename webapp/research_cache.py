@@ -0,0 +1,122 @@
+"""
+🗃️ 研究结果缓存
+================
+
+ResearcherAgent.research 的磁盘缓存（SQLite）：
+- 键 = 规范化主题 + 来源集合（来源变化视为不同的研究）
+- 过期时间以结果中的 last_verified 为起点计算 TTL
+- 超过容量时按最近访问时间淘汰（LRU）
+- 调用方可通过 force_refresh 跳过缓存
+
+使用方式：
+    cache = ResearchCache()
+    researcher = ResearcherAgent(cache=cache)
+    await researcher.research("RAG 最佳实践")                      # 未命中，执行研究并写入
+    await researcher.research("  rag  最佳实践 ")                  # 命中
+    await researcher.research("RAG 最佳实践", force_refresh=True)  # 强制刷新
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import unicodedata
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+
+DEFAULT_CACHE_PATH = Path(os.getenv(
+    "RESEARCH_CACHE_PATH",
+    Path(__file__).parent.parent / ".cache" / "research_cache.sqlite3"
+))
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def normalize_topic(topic: str) -> str:
+    """全角/半角、大小写与多余空白不影响缓存命中"""
+    return " ".join(unicodedata.normalize("NFKC", topic).casefold().split())
+
+
+def cache_key(topic: str, sources: list[str]) -> str:
+    material = normalize_topic(topic) + "\x00" + "\x1f".join(sorted(set(sources)))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _verified_at(result: dict) -> float:
+    try:
+        return datetime.fromisoformat(result["last_verified"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+class ResearchCache:
+    """基于SQLite的研究结果缓存（TTL + 容量上限）"""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS research (
+                    key TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    verified_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_research_accessed ON research(accessed_at)")
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=5))
+
+    def get(self, topic: str, sources: list[str]) -> Optional[dict]:
+        """命中且未过期时返回缓存结果"""
+        key = cache_key(topic, sources)
+        now = time.time()
+        with self._connect() as conn, conn:
+            row = conn.execute(
+                "SELECT result, verified_at FROM research WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM research WHERE key = ?", (key,))
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            conn.execute("UPDATE research SET accessed_at = ? WHERE key = ?", (now, key))
+        self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, topic: str, sources: list[str], result: dict):
+        """写入结果，并在超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO research VALUES (?, ?, ?, ?, ?)",
+                (cache_key(topic, sources), normalize_topic(topic),
+                 json.dumps(result, ensure_ascii=False), _verified_at(result), now)
+            )
+            overflow = conn.execute("SELECT COUNT(*) FROM research").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM research WHERE key IN "
+                    "(SELECT key FROM research ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.stats["evicted"] += overflow
+
+    def clear(self):
+        with self._connect() as conn, conn:
+            conn.execute("DELETE FROM research")
@@ -0,0 +1,128 @@
+"""
+🛟 LLM调用的截止时间、重试与对冲请求
+======================================
+
+供 LLMClientPool.complete 使用：
+- 截止时间：每次调用（含全部重试）必须在 deadline 秒内完成，否则抛 DeadlineExceededError
+- 重试：仅对超时、连接错误、429 和 5xx 重试，退避时间为带满抖动（full jitter）的指数退避，
+  且不会睡过截止时间
+- 对冲：请求耗时超过该角色观测到的 p95 仍未返回时，再发一个相同请求，先返回者胜出，
+  另一个被取消。对冲请求同样占用一个全局并发名额，没有空余名额时不对冲
+- 重试与对冲多发出的请求服务端同样计费：发出前先向 TokenBudget 预留额度（不足时不再发出），
+  结束后计入统计与预算（见 ExtraAttempts）
+
+挂载卡带时不做对冲（重复请求会打乱回放顺序）。
+"""
+
+import asyncio
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from webapp.token_budget import BudgetExceededError, TokenBudget
+
+
+class DeadlineExceededError(asyncio.TimeoutError):
+    """调用在截止时间内未完成（含重试）"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5          # 第一次重试前的最大退避（秒）
+    max_delay: float = 8.0
+    hedge: bool = True
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20      # 样本不足时不对冲
+    min_hedge_delay: float = 0.5     # 对冲等待时间的下限
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的退避时间（满抖动）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """超时、连接错误、429 和 5xx 可以重试；其余（如 400/401）直接抛出"""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    # openai.APIConnectionError / APITimeoutError 没有 status_code
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def quantile(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class LatencyWindow:
+    """
+    单个角色的延迟样本
+    - attempts: 胜出请求的耗时，用于计算对冲阈值
+    - unhedged: 未触发对冲时主请求的完整耗时，作为估算节省时间的参照
+      （被取消的慢请求没有完整耗时，因此估算值偏保守）
+    - calls:    整次调用（含重试/对冲）的耗时
+    """
+    attempts: deque = field(default_factory=lambda: deque(maxlen=500))
+    unhedged: deque = field(default_factory=lambda: deque(maxlen=500))
+    calls: deque = field(default_factory=lambda: deque(maxlen=500))
+
+    def hedge_delay(self, policy: RetryPolicy) -> Optional[float]:
+        if not policy.hedge or len(self.attempts) < policy.hedge_min_samples:
+            return None
+        return max(policy.min_hedge_delay, quantile(self.attempts, policy.hedge_quantile))
+
+    def expected_remaining(self, elapsed: float) -> float:
+        """已等待 elapsed 秒的请求预计还需多久（取超过 elapsed 的样本均值）"""
+        slower = [s for s in self.unhedged if s > elapsed]
+        return sum(slower) / len(slower) - elapsed if slower else 0.0
+
+
+@dataclass
+class ResilienceStats:
+    retries: int = 0
+    deadline_exceeded: int = 0
+    hedges_fired: int = 0
+    hedge_wins: int = 0
+    estimated_saved_s: float = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "retries": self.retries,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins,
+            "estimated_saved_s": round(self.estimated_saved_s, 3),
+        }
+
+
+@dataclass
+class ExtraAttempts:
+    """一次调用中重试与对冲额外发出的请求"""
+    role: str
+    budget: Optional[TokenBudget]
+    prompt_tokens: int
+    max_tokens: int
+    retries: int = 0
+    hedges: int = 0
+    reserved: int = 0
+
+    def reserve(self) -> bool:
+        """按一次完整请求预留预算；预算不足时返回 False，不应再发出请求"""
+        if self.budget is not None:
+            try:
+                self.reserved += self.budget.reserve(self.role, self.prompt_tokens, self.max_tokens)
+            except BudgetExceededError:
+                return False
+        return True
+
+    def release(self):
+        if self.budget is not None and self.reserved:
+            self.budget.release(self.role, self.reserved)
+            self.reserved = 0
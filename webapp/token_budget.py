@@ -0,0 +1,185 @@
+"""
+💰 Token预算
+=============
+
+- 调用前用 tiktoken 估算提示词token（预检）
+- 按运行整体和按角色设置预算：超过软阈值打印警告，预计超过硬上限时拒绝调用
+- 调用后按实际用量记账，估算费用并统计每个Agent的吞吐
+
+使用方式：
+    budget = TokenBudget(run_limit=200_000, role_limits={"reflector": 30_000})
+    orchestrator = EnhancedOrchestrator(budget=budget)
+    ...
+    print(budget.summary())
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional
+
+
+# 美元 / 百万token（DeepSeek 官方价格，调整时同步更新）
+MODEL_PRICING = {
+    "deepseek-chat": {"input_hit": 0.07, "input_miss": 0.27, "output": 1.10},
+    "deepseek-reasoner": {"input_hit": 0.14, "input_miss": 0.55, "output": 2.19},
+}
+
+# 每条消息的格式开销（role、分隔符等）
+TOKENS_PER_MESSAGE = 4
+
+_CJK_RE = re.compile(r"[一-鿿]")
+
+
+class BudgetExceededError(RuntimeError):
+    """预计用量超过硬上限"""
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """DeepSeek 没有公开的 tiktoken 编码，cl100k_base 的计数足够用于预算"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken 未安装或无法下载词表时退回字符估算
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(messages: list[dict]) -> int:
+    """估算一组消息的提示词token数"""
+    return sum(
+        TOKENS_PER_MESSAGE + count_text_tokens(str(m.get("content", "")))
+        for m in messages
+    ) + 2
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int,
+                  cache_hit_tokens: int = 0) -> float:
+    """按缓存命中/未命中分别计价；未知模型按 deepseek-chat 估算"""
+    pricing = MODEL_PRICING.get(model, MODEL_PRICING["deepseek-chat"])
+    cache_hit_tokens = min(cache_hit_tokens, prompt_tokens)
+    return (
+        cache_hit_tokens * pricing["input_hit"]
+        + (prompt_tokens - cache_hit_tokens) * pricing["input_miss"]
+        + completion_tokens * pricing["output"]
+    ) / 1_000_000
+
+
+@dataclass
+class UsageTotals:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_s: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "tokens_in": self.prompt_tokens,
+            "tokens_out": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "tokens_out_per_s": round(self.completion_tokens / self.latency_s, 1) if self.latency_s else 0.0,
+        }
+
+
+class TokenBudget:
+    """
+    运行级 + 角色级token预算
+
+    预检时按“已用 + 进行中调用的预留 + 本次提示词 + max_tokens”判断并预留这部分额度，
+    并发调用因此不会同时通过预检而越过硬上限。调用结束后由 record 记实际用量、
+    release 释放预留（失败或取消时只释放）。
+    """
+
+    def __init__(self, run_limit: Optional[int] = None,
+                 role_limits: Optional[dict[str, int]] = None,
+                 soft_ratio: float = 0.8,
+                 on_warning: Callable[[str], None] = print):
+        self.run_limit = run_limit
+        self.role_limits = role_limits or {}
+        self.soft_ratio = soft_ratio
+        self.on_warning = on_warning
+        self.run = UsageTotals()
+        self.roles: dict[str, UsageTotals] = {}
+        self.agents: dict[str, UsageTotals] = {}
+        # 已通过预检、尚未结束的调用所预留的token
+        self.reserved = 0
+        self.reserved_roles: dict[str, int] = {}
+        self._warned: set[str] = set()
+
+    def _check(self, scope: str, used: int, projected: int, limit: Optional[int]):
+        if limit is None:
+            return
+        if projected > limit:
+            raise BudgetExceededError(
+                f"{scope} token预算不足: 已用 {used}, 本次最多 {projected - used}, 上限 {limit}"
+            )
+        if projected >= limit * self.soft_ratio and scope not in self._warned:
+            self._warned.add(scope)
+            self.on_warning(f"⚠️ {scope} token用量已达预算的 {projected / limit:.0%} ({projected}/{limit})")
+
+    def reserve(self, role: str, prompt_tokens: int, max_output_tokens: int) -> int:
+        """
+        调用前预检并预留额度；超过硬上限时抛出 BudgetExceededError
+
+        Returns:
+            预留的token数，调用结束后必须以相同的值调用 release
+        """
+        cost = prompt_tokens + max_output_tokens
+        used = self.run.total_tokens + self.reserved
+        self._check("本次运行", used, used + cost, self.run_limit)
+        role_used = self.roles.get(role, UsageTotals()).total_tokens + self.reserved_roles.get(role, 0)
+        self._check(f"角色 {role}", role_used, role_used + cost, self.role_limits.get(role))
+        self.reserved += cost
+        self.reserved_roles[role] = self.reserved_roles.get(role, 0) + cost
+        return cost
+
+    def release(self, role: str, tokens: int):
+        """释放 reserve 预留的额度（无论调用成功、失败还是被取消）"""
+        self.reserved -= tokens
+        self.reserved_roles[role] = self.reserved_roles.get(role, 0) - tokens
+
+    def record(self, role: str, agent: str, model: str, prompt_tokens: int,
+               completion_tokens: int, latency_s: float, cache_hit_tokens: int = 0):
+        """按实际用量记账"""
+        cost = estimate_cost(model, prompt_tokens, completion_tokens, cache_hit_tokens)
+        for totals in (self.run, self.roles.setdefault(role, UsageTotals()),
+                       self.agents.setdefault(agent, UsageTotals())):
+            totals.calls += 1
+            totals.prompt_tokens += prompt_tokens
+            totals.completion_tokens += completion_tokens
+            totals.cost_usd += cost
+            totals.latency_s += latency_s
+
+    def reset(self):
+        """开始新的一次运行"""
+        self.run = UsageTotals()
+        self.roles.clear()
+        self.agents.clear()
+        self.reserved = 0
+        self.reserved_roles.clear()
+        self._warned.clear()
+
+    def summary(self) -> dict:
+        return {
+            "run": {**self.run.summary(), "limit": self.run_limit, "reserved": self.reserved},
+            "roles": {
+                role: {**totals.summary(), "limit": self.role_limits.get(role)}
+                for role, totals in self.roles.items()
+            },
+            "agents": {agent: totals.summary() for agent, totals in self.agents.items()},
+        }
@@ -68,6 +68,17 @@ app.add_middleware(
 # Gzip 压缩中间件
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# 调试端点（默认关闭）：栈采样分析器 + 内存快照对比
+# 需要仓库根目录在 PYTHONPATH 中，详见 webapp/profiling.py；
+# 本项目的 Docker 镜像只包含项目目录，导入失败时跳过而不是让服务启动失败
+if os.getenv("ENABLE_DEBUG_ENDPOINTS"):
+    try:
+        from webapp.profiling import debug_router
+    except ImportError as e:
+        print(f"⚠️ 调试端点不可用（无法导入 webapp.profiling: {e}），请在仓库根目录运行或把它加入 PYTHONPATH")
+    else:
+        app.include_router(debug_router)
+
 
 @app.get("/", response_class=HTMLResponse, tags=["前端"])
 def read_root():